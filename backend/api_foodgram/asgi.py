@@ -0,0 +1,9 @@
+import os
+
+# Окружение задаём до импорта модулей проекта, как в стандартном asgi.py.
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api_foodgram.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
+
+from api_foodgram.async_views import get_asgi_application  # noqa: E402
+
+application = get_asgi_application()
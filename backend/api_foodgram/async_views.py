@@ -0,0 +1,122 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections, connections
+from django.urls import URLPattern
+
+from .executors import get_executor
+
+
+def call_view(view, request, *args, **kwargs):
+    # Сигналы request_started/finished под ASGI приходят в другом потоке,
+    # поэтому соединения потоков пула проверяем здесь.
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            get_executor('async-views', settings.ASYNC_VIEW_THREADS),
+            functools.partial(
+                context.run,
+                call_view,
+                view,
+                request,
+                *args,
+                **kwargs
+            )
+        )
+    return wrapper
+
+
+def async_urls(patterns):
+    if not settings.ASYNC_VIEWS:
+        return patterns
+    return [
+        URLPattern(
+            pattern.pattern,
+            async_view(pattern.callback),
+            pattern.default_args,
+            pattern.name
+        ) if isinstance(pattern, URLPattern) else pattern
+        for pattern in patterns
+    ]
+
+
+def close_streaming_response(response):
+    response.close()
+    # Поток ответа завершается, его соединения с базой закрываем сами.
+    connections.close_all()
+
+
+class StreamingASGIHandler(ASGIHandler):
+    # ASGI-обработчик Django 3.2 читает потоковый ответ прямо в цикле
+    # событий, где запросы к базе запрещены. Здесь куски читаются в
+    # отдельном потоке, одном на ответ: генератор и его курсор не переходят
+    # между потоками, а ответ не собирается целиком в памяти.
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        response_headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            response_headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            response_headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip()
+            ))
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix='asgi-stream'
+        )
+        parts = iter(response)
+        try:
+            while True:
+                part = await loop.run_in_executor(executor, next, parts, None)
+                if part is None:
+                    break
+                for chunk, _ in self.chunk_bytes(part):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            await send({'type': 'http.response.body'})
+        finally:
+            await loop.run_in_executor(
+                executor,
+                close_streaming_response,
+                response
+            )
+            executor.shutdown(wait=False)
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return StreamingASGIHandler()
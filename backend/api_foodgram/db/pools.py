@@ -0,0 +1,36 @@
+import os
+import threading
+
+# Пулы соединений процесса по алиасам баз. Модуль не импортирует psycopg2,
+# чтобы статистику можно было читать и на установках с SQLite.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _reset_pools():
+    # Соединения родителя после fork не используем, воркер открывает свои.
+    global _pools, _pools_lock
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_pools)
+
+
+def get_or_create_pool(alias, create):
+    if alias not in _pools:
+        with _pools_lock:
+            if alias not in _pools:
+                _pools[alias] = create()
+    return _pools[alias]
+
+
+def discard_pool(alias):
+    with _pools_lock:
+        pool = _pools.pop(alias, None)
+    if pool is not None:
+        pool.closeall()
+
+
+def get_pool_stats():
+    return {alias: pool.get_stats() for alias, pool in _pools.items()}
@@ -0,0 +1,203 @@
+import threading
+import time
+
+import psycopg2
+from django.db.backends.postgresql import base
+from psycopg2 import extensions, pool
+
+from ..pools import get_or_create_pool
+
+POOL_DEFAULTS = {
+    'max_size': 0,
+    'max_idle': None,
+    'timeout': 10,
+    'check_idle': 5,
+}
+
+
+class ConnectionPool(pool.ThreadedConnectionPool):
+    # psycopg2 сразу отдаёт PoolError, когда соединения кончились, поэтому
+    # очередь с таймаутом держим на семафоре. Простаивающих соединений
+    # остаётся не больше minconn.
+
+    def __init__(self, connect, max_size, max_idle, timeout, check_idle):
+        self.connect = connect
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.released_at = {}
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'connects': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'in_use': 0,
+        }
+        super().__init__(0, max_size)
+        self.minconn = max_size if max_idle is None else max_idle
+
+    def count(self, name, delta=1):
+        with self.stats_lock:
+            self.stats[name] += delta
+
+    def _connect(self, key=None):
+        connection = self.connect()
+        self.count('connects')
+        if key is not None:
+            self._used[key] = connection
+            self._rused[id(connection)] = key
+        else:
+            self._pool.append(connection)
+        return connection
+
+    def is_usable(self, connection):
+        if connection.closed:
+            return False
+        released_at = self.released_at.pop(id(connection), None)
+        if released_at is None or (
+            time.monotonic() - released_at < self.check_idle
+        ):
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            return False
+        return True
+
+    def acquire(self):
+        if not self.slots.acquire(blocking=False):
+            self.count('waits')
+            if not self.slots.acquire(timeout=self.timeout):
+                self.count('timeouts')
+                raise psycopg2.OperationalError(
+                    'Нет свободных соединений с базой данных '
+                    f'за {self.timeout} с.'
+                )
+        try:
+            connection = self.getconn()
+            while not self.is_usable(connection):
+                self.count('discarded')
+                self.putconn(connection, close=True)
+                connection = self.getconn()
+        except BaseException:
+            self.slots.release()
+            raise
+        self.count('checkouts')
+        self.count('in_use')
+        return connection
+
+    def release(self, connection):
+        close = bool(connection.closed)
+        try:
+            if not close:
+                status = connection.info.transaction_status
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    if connection.autocommit:
+                        # rollback() в autocommit ничего не делает, а
+                        # транзакцию мог открыть BEGIN из сырого SQL.
+                        with connection.cursor() as cursor:
+                            cursor.execute('ROLLBACK')
+                    else:
+                        connection.rollback()
+        except psycopg2.Error:
+            close = True
+        finally:
+            if close:
+                self.count('discarded')
+            else:
+                self.released_at[id(connection)] = time.monotonic()
+            self.putconn(connection, close=close)
+            if connection.closed:
+                self.released_at.pop(id(connection), None)
+            self.count('in_use', -1)
+            self.slots.release()
+
+    def get_stats(self):
+        with self.stats_lock:
+            return dict(
+                self.stats,
+                idle=len(self._pool),
+                max_size=self.maxconn
+            )
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_options = {
+            **POOL_DEFAULTS,
+            **self.settings_dict.get('POOL', {})
+        }
+        self.health_check_done = False
+
+    @property
+    def pooled(self):
+        return bool(self.pool_options['max_size'])
+
+    def get_pool(self):
+        return get_or_create_pool(self.alias, self.create_pool)
+
+    def create_pool(self):
+        conn_params = self.get_connection_params()
+        return ConnectionPool(
+            lambda: base.DatabaseWrapper.get_new_connection(
+                self,
+                conn_params
+            ),
+            max_size=self.pool_options['max_size'],
+            max_idle=self.pool_options['max_idle'],
+            timeout=self.pool_options['timeout'],
+            check_idle=self.pool_options['check_idle']
+        )
+
+    def get_new_connection(self, conn_params):
+        if not self.pooled:
+            return super().get_new_connection(conn_params)
+        connection = self.get_pool().acquire()
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level',
+            connection.isolation_level
+        )
+        return connection
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+        if self.pooled:
+            # Соединение из пула возвращаем в конце каждого запроса.
+            self.close_at = time.monotonic()
+
+    def _close(self):
+        if self.pooled and self.connection is not None:
+            with self.wrap_database_errors:
+                self.get_pool().release(self.connection)
+            return
+        super()._close()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        # Проверяем только перед курсором: ensure_connection вызывается и
+        # внутри connect(), до включения autocommit.
+        if (
+            self.connection is None
+            or self.health_check_done
+            or self.in_atomic_block
+            or not self.settings_dict.get('CONN_HEALTH_CHECKS')
+        ):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
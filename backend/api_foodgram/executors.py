@@ -0,0 +1,28 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _reset_executors():
+    # Потоки пула не переживают fork (воркер gunicorn после preload), поэтому
+    # в дочернем процессе пулы создаются заново.
+    global _executors, _executors_lock
+    _executors = {}
+    _executors_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_executors)
+
+
+def get_executor(name, max_workers):
+    if name not in _executors:
+        with _executors_lock:
+            if name not in _executors:
+                _executors[name] = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix=name
+                )
+    return _executors[name]
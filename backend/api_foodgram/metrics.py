@@ -0,0 +1,402 @@
+import asyncio
+import contextlib
+import contextvars
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .db.pools import get_pool_stats
+from .streaming import iterate_in_context
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+METRICS_ARCHIVE = 'archive.json'
+METRICS_LOCK = 'metrics.lock'
+METRICS_VIEW_NAME = 'metrics'
+COUNTERS = (
+    (
+        'sql',
+        'foodgram_sql_seconds_total',
+        'Время SQL-запросов.'
+    ),
+    (
+        'view_python',
+        'foodgram_view_python_seconds_total',
+        'Время view без SQL: аутентификация, права, фильтры, пагинация '
+        'и сериализация.'
+    ),
+    (
+        'response_bytes',
+        'foodgram_response_bytes_total',
+        'Размер ответов без потоковых.'
+    ),
+)
+HISTOGRAMS = (
+    (
+        'duration',
+        'foodgram_request_duration_seconds',
+        'Время обработки запроса.',
+        DURATION_BUCKETS
+    ),
+    (
+        'queries',
+        'foodgram_request_queries',
+        'Число SQL-запросов на запрос.',
+        QUERY_BUCKETS
+    ),
+)
+
+# Счётчики текущего запроса. Словарь изменяемый, чтобы запросы к базе из
+# потока пула (ASGI) попадали в него.
+_request_stats = contextvars.ContextVar('metrics_request_stats', default=None)
+_metrics = {}
+_metrics_lock = threading.Lock()
+_flushed_at = 0.0
+
+
+def record_execute(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats['queries'] += 1
+        stats['sql'] += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_execute_recorder(sender, connection, **kwargs):
+    if record_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_execute)
+
+
+def new_entry():
+    return {
+        'count': 0,
+        'duration': 0.0,
+        'duration_buckets': [0] * len(DURATION_BUCKETS),
+        'queries': 0,
+        'queries_buckets': [0] * len(QUERY_BUCKETS),
+        'sql': 0.0,
+        'view_python': 0.0,
+        'response_bytes': 0,
+    }
+
+
+def observe(entry, name, buckets, value):
+    entry[name] += value
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            entry[f'{name}_buckets'][index] += 1
+
+
+def record_request(labels, duration, queries, sql, view_python, size):
+    with _metrics_lock:
+        entry = _metrics.get(labels)
+        if entry is None:
+            entry = _metrics[labels] = new_entry()
+        entry['count'] += 1
+        observe(entry, 'duration', DURATION_BUCKETS, duration)
+        observe(entry, 'queries', QUERY_BUCKETS, queries)
+        entry['sql'] += sql
+        entry['view_python'] += view_python
+        entry['response_bytes'] += size
+
+
+def merge_entries(target, entries):
+    for labels, entry in entries:
+        labels = tuple(labels)
+        merged = target.get(labels)
+        if merged is None:
+            merged = target[labels] = new_entry()
+        for name, value in entry.items():
+            # Поля, которых нет в текущей версии (файлы воркеров до
+            # обновления), пропускаем.
+            if name not in merged:
+                continue
+            if isinstance(value, list):
+                merged[name] = [a + b for a, b in zip(merged[name], value)]
+            else:
+                merged[name] += value
+
+
+def get_snapshot():
+    with _metrics_lock:
+        entries = [
+            [list(labels), dict(entry)] for labels, entry in _metrics.items()
+        ]
+    return {'entries': entries, 'pools': get_pool_stats()}
+
+
+def write_json(path, data):
+    # Свой временный файл у каждого потока: потоки воркера gthread могут
+    # сбрасывать счётчики одновременно.
+    temp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'w') as output:
+        json.dump(data, output)
+    os.replace(temp_path, path)
+
+
+def read_json(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+def flush_metrics(force=False):
+    # Воркеры gunicorn сбрасывают счётчики в METRICS_DIR, чтобы /api/metrics/
+    # отдавал сумму по всем процессам.
+    global _flushed_at
+    directory = settings.METRICS_DIR
+    now = time.monotonic()
+    if not directory or (
+        not force and now - _flushed_at < settings.METRICS_FLUSH_INTERVAL
+    ):
+        return
+    _flushed_at = now
+    try:
+        os.makedirs(directory, exist_ok=True)
+        write_json(
+            os.path.join(directory, f'{os.getpid()}.json'),
+            get_snapshot()
+        )
+    except OSError:
+        logger.warning('Не удалось сбросить метрики в %s', directory)
+
+
+@contextlib.contextmanager
+def locked_directory(directory, operation):
+    # Мастер переносит файл воркера в архив двумя шагами. Без блокировки
+    # читатель между ними посчитал бы счётчики дважды или потерял бы их.
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, METRICS_LOCK), 'a') as lock:
+        fcntl.flock(lock, operation)
+        yield
+
+
+def archive_metrics(directory, pid):
+    # Счётчики завершившегося воркера переносим в общий архив, иначе они
+    # пропали бы при перезапуске воркера по max_requests.
+    path = os.path.join(directory, f'{pid}.json')
+    with locked_directory(directory, fcntl.LOCK_EX):
+        snapshot = read_json(path)
+        if snapshot is None:
+            return
+        archive_path = os.path.join(directory, METRICS_ARCHIVE)
+        archive = read_json(archive_path) or {'entries': []}
+        merged = {}
+        merge_entries(merged, archive['entries'])
+        merge_entries(merged, snapshot['entries'])
+        entries = [[list(labels), entry] for labels, entry in merged.items()]
+        write_json(archive_path, {'entries': entries})
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def collect_metrics():
+    snapshot = get_snapshot()
+    merged = {}
+    merge_entries(merged, snapshot['entries'])
+    pools = [snapshot['pools']]
+    directory = settings.METRICS_DIR
+    if directory:
+        own_path = os.path.join(directory, f'{os.getpid()}.json')
+        with locked_directory(directory, fcntl.LOCK_SH):
+            for path in glob.glob(os.path.join(directory, '*.json')):
+                if path == own_path:
+                    continue
+                # Файл мог исчезнуть после glob, read_json вернёт None.
+                data = read_json(path)
+                if data is not None:
+                    merge_entries(merged, data['entries'])
+                    pools.append(data.get('pools', {}))
+    pool_stats = {}
+    for stats in pools:
+        for alias, values in stats.items():
+            totals = pool_stats.setdefault(alias, {})
+            for name, value in values.items():
+                totals[name] = totals.get(name, 0) + value
+    return merged, pool_stats
+
+
+def format_labels(labels):
+    return ','.join(
+        '{0}="{1}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in labels
+    )
+
+
+def render_metrics():
+    entries, pool_stats = collect_metrics()
+    items = sorted(entries.items())
+    lines = [
+        '# HELP foodgram_requests_total Число обработанных запросов.',
+        '# TYPE foodgram_requests_total counter',
+    ]
+    labels = {
+        key: list(zip(('view', 'method', 'status'), key)) for key, _ in items
+    }
+    for key, entry in items:
+        lines.append(
+            f'foodgram_requests_total{{{format_labels(labels[key])}}} '
+            f'{entry["count"]}'
+        )
+    for name, metric, help_text in COUNTERS:
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+        for key, entry in items:
+            lines.append(
+                f'{metric}{{{format_labels(labels[key])}}} {entry[name]}'
+            )
+    for name, metric, help_text, buckets in HISTOGRAMS:
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+        for key, entry in items:
+            for bound, count in zip(buckets, entry[f'{name}_buckets']):
+                bucket_labels = format_labels(labels[key] + [('le', bound)])
+                lines.append(f'{metric}_bucket{{{bucket_labels}}} {count}')
+            bucket_labels = format_labels(labels[key] + [('le', '+Inf')])
+            lines += [
+                f'{metric}_bucket{{{bucket_labels}}} {entry["count"]}',
+                f'{metric}_sum{{{format_labels(labels[key])}}} {entry[name]}',
+                f'{metric}_count{{{format_labels(labels[key])}}} '
+                f'{entry["count"]}',
+            ]
+    stat_names = sorted({
+        name for values in pool_stats.values() for name in values
+    })
+    for name in stat_names:
+        metric = f'foodgram_db_pool_{name}'
+        lines += [
+            f'# HELP {metric} Пул соединений с базой: {name}.',
+            f'# TYPE {metric} gauge',
+        ]
+        for alias, values in sorted(pool_stats.items()):
+            if name in values:
+                lines.append(
+                    f'{metric}{{{format_labels([("alias", alias)])}}} '
+                    f'{values[name]}'
+                )
+    return '\n'.join(lines) + '\n'
+
+
+def stream_with_stats(content, stats, finish):
+    # Запросы потокового ответа и его размер считаем по мере отдачи.
+    size = 0
+    try:
+        for chunk in iterate_in_context(content, _request_stats, stats):
+            size += len(chunk)
+            yield chunk
+    finally:
+        finish(size)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Тот же признак, что ставит MiddlewareMixin: по нему Django
+            # не оборачивает цепочку ASGI в sync_to_async.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        for connection in connections.all():
+            install_execute_recorder(None, connection)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = {'queries': 0, 'sql': 0.0, 'view_started': None}
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.process_metrics(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = {'queries': 0, 'sql': 0.0, 'view_started': None}
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.process_metrics(request, response, stats, started)
+
+    def process_metrics(self, request, response, stats, started):
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unmatched'
+        if view_name == METRICS_VIEW_NAME:
+            return response
+
+        def finish(size):
+            finished = time.perf_counter()
+            view_python = 0.0
+            if stats['view_started'] is not None:
+                view_python = max(
+                    0.0,
+                    finished - stats['view_started']
+                    - (stats['sql'] - stats['view_sql'])
+                )
+            record_request(
+                (view_name, request.method, str(response.status_code)),
+                finished - started,
+                stats['queries'],
+                stats['sql'],
+                view_python,
+                size
+            )
+            if stats['queries'] > settings.METRICS_QUERY_WARNING:
+                logger.warning(
+                    '%s %s: %s SQL-запросов за %.1f мс',
+                    request.method,
+                    view_name,
+                    stats['queries'],
+                    stats['sql'] * 1000
+                )
+            flush_metrics()
+            return view_python, finished - started
+
+        if response.streaming:
+            response.streaming_content = stream_with_stats(
+                response.streaming_content,
+                stats,
+                finish
+            )
+            view_python, duration = 0.0, time.perf_counter() - started
+        else:
+            view_python, duration = finish(len(response.content))
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={stats["sql"] * 1000:.1f};'
+                f'desc="{stats["queries"]} queries", '
+                f'view;dur={view_python * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = _request_stats.get()
+        if stats is not None:
+            stats['view_started'] = time.perf_counter()
+            stats['view_sql'] = stats['sql']
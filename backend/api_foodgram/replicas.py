@@ -0,0 +1,221 @@
+import asyncio
+import contextlib
+import contextvars
+import hashlib
+import random
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.urls import Resolver404, resolve
+
+from .streaming import iterate_in_context
+
+REPLICA_PIN_KEY = 'replica:pin:{0}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+POSTGRES_LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+    'END'
+)
+
+# Состояние текущего запроса: выбранная реплика и были ли записи.
+# Словарь изменяемый, чтобы запись из потока пула (ASGI) была видна
+# middleware.
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+_health = {}
+_health_lock = threading.Lock()
+
+
+def check_replica(alias):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(POSTGRES_LAG_SQL)
+                lag = cursor.fetchone()[0]
+                return lag is None or lag <= settings.REPLICA_MAX_LAG
+            cursor.execute('SELECT 1')
+        return True
+    except DatabaseError:
+        try:
+            connection.close()
+        except DatabaseError:
+            pass
+        return False
+
+
+def is_replica_healthy(alias):
+    checked_at, healthy = _health.get(alias, (None, True))
+    interval = (
+        settings.REPLICA_CHECK_INTERVAL if healthy
+        else settings.REPLICA_RETRY_INTERVAL
+    )
+    now = time.monotonic()
+    if checked_at is not None and now - checked_at < interval:
+        return healthy
+    healthy = check_replica(alias)
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def get_healthy_replica():
+    replicas = [
+        alias for alias in settings.REPLICA_DATABASES
+        if is_replica_healthy(alias)
+    ]
+    return random.choice(replicas) if replicas else None
+
+
+def get_replica_health():
+    return {alias: healthy for alias, (_, healthy) in _health.items()}
+
+
+def reads_replica():
+    state = _request_state.get()
+    return state is not None and state['alias'] is not None
+
+
+@contextlib.contextmanager
+def use_primary():
+    # Общие кэши заполняем с основной базы: реплика может ещё не получить
+    # изменение, под новой версией кэша легли бы старые данные.
+    state = _request_state.get()
+    if state is None or state['alias'] is None:
+        yield
+        return
+    alias = state['alias']
+    state['alias'] = None
+    try:
+        yield
+    finally:
+        if not state['wrote']:
+            state['alias'] = alias
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            return state['alias']
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+def get_pin_keys(request):
+    keys = []
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        keys.append(hashlib.md5(authorization.encode()).hexdigest())
+    address = request.META.get(
+        'HTTP_X_FORWARDED_FOR',
+        request.META.get('REMOTE_ADDR', '')
+    ).split(',')[0].strip()
+    if address:
+        keys.append(address)
+    return [REPLICA_PIN_KEY.format(key) for key in keys]
+
+
+def reads_from_replica(request):
+    if request.method not in SAFE_METHODS:
+        return False
+    try:
+        view = resolve(request.path_info).func
+    except Resolver404:
+        return False
+    actions = getattr(view, 'actions', None) or {}
+    read_actions = getattr(
+        getattr(view, 'cls', None),
+        'replica_read_actions',
+        ()
+    )
+    return actions.get(request.method.lower()) in read_actions
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Тот же признак, что ставит MiddlewareMixin: по нему Django
+            # не оборачивает цепочку ASGI в sync_to_async.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.REPLICA_DATABASES:
+            return self.get_response(request)
+        pin_keys = get_pin_keys(request)
+        state = self.get_request_state(request, pin_keys)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.process_replica_response(response, state, pin_keys)
+
+    async def __acall__(self, request):
+        if not settings.REPLICA_DATABASES:
+            return await self.get_response(request)
+        pin_keys = get_pin_keys(request)
+        state = await sync_to_async(self.get_request_state)(request, pin_keys)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return await sync_to_async(self.process_replica_response)(
+            response,
+            state,
+            pin_keys
+        )
+
+    def get_request_state(self, request, pin_keys):
+        alias = None
+        if reads_from_replica(request) and not cache.get_many(pin_keys):
+            alias = get_healthy_replica()
+        return {'alias': alias, 'wrote': False}
+
+    def process_replica_response(self, response, state, pin_keys):
+        if response.streaming:
+            # Потоковые ответы (список покупок) читают базу при отдаче.
+            response.streaming_content = iterate_in_context(
+                response.streaming_content,
+                _request_state,
+                state
+            )
+        if state['wrote'] and pin_keys:
+            # Закрепляем за основной базой токен, а анонима - по адресу.
+            cache.set(pin_keys[0], True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+
+@receiver(post_save)
+@receiver(post_delete)
+@receiver(m2m_changed)
+def data_written(sender, **kwargs):
+    state = _request_state.get()
+    if state is not None:
+        state['wrote'] = True
+        state['alias'] = None
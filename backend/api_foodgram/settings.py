@@ -25,6 +25,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api_foodgram.metrics.MetricsMiddleware',
+    'api_foodgram.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,17 +56,124 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'api_foodgram.wsgi.application'
 
+# Postgres подключаем через свой движок: пул соединений и проверка
+# соединений перед запросом. Без DB_POOL_MAX_SIZE он работает как обычный.
+DB_ENGINES = {
+    'django.db.backends.postgresql': 'api_foodgram.db.postgresql',
+    'django.db.backends.postgresql_psycopg2': 'api_foodgram.db.postgresql',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': os.environ['DB_ENGINE'],
+        'ENGINE': DB_ENGINES.get(
+            os.environ['DB_ENGINE'],
+            os.environ['DB_ENGINE']
+        ),
         'NAME': os.environ['DB_NAME'],
         'USER': os.environ['POSTGRES_USER'],
         'PASSWORD': os.environ['POSTGRES_PASSWORD'],
         'HOST': os.environ['DB_HOST'],
         'PORT': os.environ['DB_PORT'],
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Ключи ниже понимает только api_foodgram.db.postgresql.
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'POOL': {
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 0)),
+            'max_idle': int(os.environ['DB_POOL_MAX_IDLE']) if os.environ.get('DB_POOL_MAX_IDLE') else None,
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+}
+
+# Реплики для чтения: через запятую host[:port] (для SQLite - пути к файлам).
+REPLICA_DATABASES = []
+
+for number, replica in enumerate(
+    filter(None, os.environ.get('DB_REPLICAS', '').split(',')),
+    start=1
+):
+    alias = f'replica_{number}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if 'sqlite' in DATABASES['default']['ENGINE']:
+        DATABASES[alias]['NAME'] = replica.strip()
+    else:
+        host, _, port = replica.strip().partition(':')
+        DATABASES[alias]['HOST'] = host
+        DATABASES[alias]['PORT'] = port or DATABASES['default']['PORT']
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['api_foodgram.replicas.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+REPLICA_CHECK_INTERVAL = float(os.environ.get('REPLICA_CHECK_INTERVAL', 5))
+
+REPLICA_RETRY_INTERVAL = float(os.environ.get('REPLICA_RETRY_INTERVAL', 30))
+
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 10))
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKEND),
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'django_cache')
+            if CACHE_BACKEND == 'file' else ''
+        ),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', 300)),
     }
 }
 
+if CACHE_BACKEND in ('locmem', 'file'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+    }
+
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 60 * 60))
+
+# Каталог, через который воркеры gunicorn делятся метриками.
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+METRICS_QUERY_WARNING = int(os.environ.get('METRICS_QUERY_WARNING', 30))
+
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '1') == '1'
+
+# Доступ к /api/metrics/: по токену (Authorization: Bearer <токен>) или с
+# адресов и подсетей из списка.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+METRICS_ALLOWED_IPS = [
+    network.strip() for network in os.environ.get(
+        'METRICS_ALLOWED_IPS',
+        '127.0.0.1,::1'
+    ).split(',') if network.strip()
+]
+
+# Кэш токенов сбрасывается по версии в общем кэше. В locmem её не видят
+# другие воркеры, и отозванный токен принимался бы до TOKEN_CACHE_TTL.
+TOKEN_CACHE_ENABLED = (
+    os.environ.get('TOKEN_CACHE', '1') == '1' and CACHE_BACKEND != 'locmem'
+)
+
+TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 300))
+
+TOKEN_CACHE_MAX_SIZE = int(os.environ.get('TOKEN_CACHE_MAX_SIZE', 10000))
+
+TOKEN_CACHE_CHECK_INTERVAL = float(
+    os.environ.get('TOKEN_CACHE_CHECK_INTERVAL', 1)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -82,7 +191,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -94,6 +203,7 @@ REST_FRAMEWORK = {
 
 DJOSER = {
     'HIDE_USERS': False,
+    'LOGOUT_ON_PASSWORD_CHANGE': True,
     'SERIALIZERS': {
         'user': 'users.serializers.UsersSerializer',
         'current_user': 'users.serializers.UsersSerializer',
@@ -124,6 +234,30 @@ MEDIA_URL = '/backend_media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'backend_media')
 
+DEFAULT_FILE_STORAGE = 'recipes.storage.ContentAddressedStorage'
+
+RECIPE_IMAGE_MAX_BYTES = int(
+    os.environ.get('RECIPE_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+)
+
+RECIPE_IMAGE_MAX_PIXELS = int(
+    os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40 * 1000 * 1000)
+)
+
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+
+RECIPE_IMAGE_VARIANT_FORMAT = os.environ.get(
+    'RECIPE_IMAGE_VARIANT_FORMAT', 'WEBP'
+)
+
+PDF_FONT_PATH = os.environ.get(
+    'PDF_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+
+ASYNC_VIEW_THREADS = int(os.environ.get('ASYNC_VIEW_THREADS', 16))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 DEFAULT_EMPTY_VALUE_DISPLAY = '-пусто-'
@@ -0,0 +1,13 @@
+def iterate_in_context(content, variable, value):
+    # Потоковый ответ читается уже после выхода из middleware, поэтому
+    # состояние запроса выставляем заново на каждый кусок.
+    iterator = iter(content)
+    while True:
+        token = variable.set(value)
+        try:
+            chunk = next(iterator, None)
+        finally:
+            variable.reset(token)
+        if chunk is None:
+            return
+        yield chunk
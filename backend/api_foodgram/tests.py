@@ -0,0 +1,217 @@
+import threading
+import unittest
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import (DEFAULT_DB_ALIAS, DatabaseError, OperationalError,
+                       connections)
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tags
+from users.models import CustomUser
+from . import replicas
+from .db.pools import discard_pool, get_pool_stats
+
+POOL_ALIAS = 'pool_test'
+REPLICA_ALIAS = 'replica_test'
+RECIPES_URL = '/api/recipes/'
+
+# Реплика для тестов маршрутизации. Тестовый раннер читает DATABASES после
+# импорта тестов и делает её зеркалом default, как реплики из DB_REPLICAS.
+connections.databases.setdefault(
+    REPLICA_ALIAS,
+    dict(connections.databases[DEFAULT_DB_ALIAS], TEST={'MIRROR': 'default'})
+)
+
+
+@unittest.skipUnless(
+    connections[DEFAULT_DB_ALIAS].vendor == 'postgresql',
+    'Пул соединений есть только у PostgreSQL.'
+)
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.settings_dict = dict(
+            connections[DEFAULT_DB_ALIAS].settings_dict,
+            CONN_MAX_AGE=0,
+            POOL={'max_size': 2, 'max_idle': 1, 'timeout': 0.2}
+        )
+
+    def tearDown(self):
+        discard_pool(POOL_ALIAS)
+
+    def new_connection(self):
+        return connections[DEFAULT_DB_ALIAS].__class__(
+            self.settings_dict,
+            POOL_ALIAS
+        )
+
+    def query(self, wrapper):
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_reused(self):
+        wrapper = self.new_connection()
+        first = self.query(wrapper)
+        wrapper.close()
+        second = self.query(wrapper)
+        wrapper.close()
+        self.assertEqual(first, second)
+        stats = get_pool_stats()[POOL_ALIAS]
+        self.assertEqual(stats['connects'], 1)
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['idle'], 1)
+
+    def test_open_transaction_is_rolled_back(self):
+        from psycopg2 import extensions
+
+        wrapper = self.new_connection()
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        with raw.cursor() as cursor:
+            cursor.execute('BEGIN')
+            cursor.execute('SELECT 1')
+        self.assertEqual(
+            raw.info.transaction_status,
+            extensions.TRANSACTION_STATUS_INTRANS
+        )
+        wrapper.close()
+        self.assertFalse(raw.closed)
+        self.assertEqual(
+            raw.info.transaction_status,
+            extensions.TRANSACTION_STATUS_IDLE
+        )
+
+    def test_exhausted_pool_times_out(self):
+        wrappers = [self.new_connection() for _ in range(2)]
+        for wrapper in wrappers:
+            wrapper.ensure_connection()
+        errors = []
+
+        def connect():
+            try:
+                self.new_connection().ensure_connection()
+            except DatabaseError as error:
+                errors.append(error)
+
+        thread = threading.Thread(target=connect)
+        thread.start()
+        thread.join()
+        for wrapper in wrappers:
+            wrapper.close()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(get_pool_stats()[POOL_ALIAS]['timeouts'], 1)
+        self.assertEqual(get_pool_stats()[POOL_ALIAS]['in_use'], 0)
+
+
+@override_settings(REPLICA_DATABASES=[REPLICA_ALIAS])
+class ReplicaRoutingTest(TransactionTestCase):
+    # Зеркало - отдельное соединение, поэтому данные теста должны быть
+    # зафиксированы, а не жить в транзакции TestCase.
+    databases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+
+    def setUp(self):
+        cache.clear()
+        replicas._health.clear()
+        self.user = CustomUser.objects.create_user(
+            email='author@test.ru',
+            username='author',
+            password='pass12345!',
+            first_name='Автор',
+            last_name='Рецептов'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10
+        )
+
+    def tearDown(self):
+        replicas._health.clear()
+        cache.clear()
+
+    def capture(self):
+        return (
+            CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]),
+            CaptureQueriesContext(connections[REPLICA_ALIAS])
+        )
+
+    def run_middleware(self, view, path=RECIPES_URL):
+        request = RequestFactory().get(path, REMOTE_ADDR='10.0.0.1')
+        return replicas.ReplicaMiddleware(view)(request)
+
+    def test_reads_go_to_replica(self):
+        primary, replica = self.capture()
+        with primary, replica:
+            response = APIClient().get(RECIPES_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertTrue(replica.captured_queries)
+        self.assertFalse(primary.captured_queries)
+
+    def test_writes_go_to_default(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        primary, replica = self.capture()
+        with primary, replica:
+            response = client.get(f'{RECIPES_URL}{self.recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(primary.captured_queries)
+        self.assertFalse(replica.captured_queries)
+        self.assertEqual(
+            replicas.ReplicaRouter().db_for_write(Recipe),
+            DEFAULT_DB_ALIAS
+        )
+
+    def test_reads_are_pinned_to_primary_after_write(self):
+        aliases = []
+
+        def view(request):
+            aliases.append(Recipe.objects.all().db)
+            Tags.objects.create(name='Тэг', color='#000000', slug='tag')
+            aliases.append(Recipe.objects.all().db)
+            return HttpResponse()
+
+        self.run_middleware(view)
+        self.assertEqual(aliases, [REPLICA_ALIAS, DEFAULT_DB_ALIAS])
+        # Следующий запрос того же клиента тоже читает основную базу.
+        self.run_middleware(
+            lambda request: aliases.append(Recipe.objects.all().db)
+            or HttpResponse()
+        )
+        self.assertEqual(aliases[-1], DEFAULT_DB_ALIAS)
+
+    def test_use_primary(self):
+        aliases = []
+
+        def view(request):
+            with replicas.use_primary():
+                aliases.append(Recipe.objects.all().db)
+            aliases.append(Recipe.objects.all().db)
+            return HttpResponse()
+
+        self.run_middleware(view)
+        self.assertEqual(aliases, [DEFAULT_DB_ALIAS, REPLICA_ALIAS])
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        primary, replica = self.capture()
+        with mock.patch.object(
+            connections[REPLICA_ALIAS],
+            'cursor',
+            side_effect=OperationalError
+        ), primary, replica:
+            response = APIClient().get(RECIPES_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertTrue(primary.captured_queries)
+        self.assertFalse(replica.captured_queries)
+        self.assertEqual(
+            APIClient().get('/api/health/').json()['replicas'],
+            {REPLICA_ALIAS: False}
+        )
@@ -3,8 +3,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from .views import health, metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/health/', health, name='health'),
+    path('api/metrics/', metrics, name='metrics'),
     path('api/', include('users.urls')),
     path('api/', include('recipes.urls')),
 ]
@@ -0,0 +1,77 @@
+import hmac
+import ipaddress
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+
+from .metrics import render_metrics
+from .replicas import get_replica_health
+
+_schema_is_current = False
+
+
+def schema_is_current():
+    global _schema_is_current
+    if _schema_is_current:
+        return True
+    executor = MigrationExecutor(connection)
+    if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+        return False
+    _schema_is_current = True
+    return True
+
+
+def health(request):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        if not schema_is_current():
+            return JsonResponse(
+                {
+                    'status': 'unavailable',
+                    'detail': 'Есть непримененные миграции.'
+                },
+                status=503,
+                json_dumps_params={'ensure_ascii': False}
+            )
+    except DatabaseError:
+        return JsonResponse(
+            {'status': 'unavailable', 'detail': 'База данных недоступна.'},
+            status=503,
+            json_dumps_params={'ensure_ascii': False}
+        )
+    data = {'status': 'ok'}
+    replica_health = get_replica_health()
+    if replica_health:
+        data['replicas'] = replica_health
+    return JsonResponse(data)
+
+
+def metrics_allowed(request):
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if settings.METRICS_TOKEN and hmac.compare_digest(
+        authorization.encode(),
+        f'Bearer {settings.METRICS_TOKEN}'.encode()
+    ):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network, strict=False)
+        for network in settings.METRICS_ALLOWED_IPS
+    )
+
+
+def metrics(request):
+    # nginx закрывает /api/metrics/ снаружи, но до backend:8000 можно
+    # достучаться и в обход него.
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        render_metrics(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
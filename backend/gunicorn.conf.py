@@ -0,0 +1,115 @@
+import glob
+import multiprocessing
+import os
+
+
+def get_cpu_count():
+    # Учитываем квоту процессора контейнера (cgroup v2 и v1), а не только
+    # число ядер хоста.
+    cpu_count = (
+        len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity')
+        else multiprocessing.cpu_count()
+    )
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as cpu_max:
+            quota, period = cpu_max.read().split()
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as cpu_quota:
+                quota = cpu_quota.read()
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as cpu_period:
+                period = cpu_period.read()
+        except OSError:
+            return cpu_count
+    if quota.strip() in ('max', '-1'):
+        return cpu_count
+    return max(1, min(cpu_count, -(-int(quota) // int(period))))
+
+
+CPU_COUNT = get_cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# Асинхронному воркеру (uvicorn) хватает процесса на ядро.
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS',
+    CPU_COUNT if 'uvicorn' in worker_class.lower() else CPU_COUNT * 2 + 1
+))
+threads = int(os.environ.get(
+    'GUNICORN_THREADS',
+    4 if worker_class == 'gthread' else 1
+))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get(
+    'GUNICORN_MAX_REQUESTS_JITTER',
+    max_requests // 10
+))
+# Heartbeat-файлы воркеров в памяти, а не на overlay-диске контейнера.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+# Воркеры складывают сюда метрики для /api/metrics/.
+METRICS_DIR = os.environ.setdefault(
+    'METRICS_DIR',
+    os.path.join(worker_tmp_dir or '/tmp', 'foodgram-metrics')
+)
+
+
+def on_starting(server):
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        os.remove(path)
+
+
+def when_ready(server):
+    server.log.info(
+        'Gunicorn готов: воркеров %s (%s), потоков %s, preload=%s',
+        server.cfg.workers,
+        server.cfg.worker_class_str,
+        server.cfg.threads,
+        server.cfg.preload_app
+    )
+    if server.cfg.workers > 1 and os.environ.get(
+        'CACHE_BACKEND', 'locmem'
+    ) == 'locmem':
+        server.log.warning(
+            'CACHE_BACKEND=locmem не общий для воркеров: версии кэша и ETag '
+            'в них расходятся, задайте redis или memcached'
+        )
+
+
+def pre_fork(server, worker):
+    # Соединения, открытые мастером при preload, закрываем до fork, чтобы
+    # воркеры не унаследовали общий сокет. Без preload мастер Django не
+    # загружает.
+    if server.cfg.preload_app:
+        from django.db import connections
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    server.log.info('Воркер %s запущен', worker.pid)
+
+
+def worker_exit(server, worker):
+    from api_foodgram.metrics import flush_metrics
+    flush_metrics(force=True)
+    server.log.info(
+        'Воркер %s завершён после %s запросов',
+        worker.pid,
+        worker.nr
+    )
+
+
+def worker_abort(worker):
+    worker.log.warning('Воркер %s прерван по таймауту', worker.pid)
+
+
+def child_exit(server, worker):
+    from api_foodgram.metrics import archive_metrics
+    archive_metrics(METRICS_DIR, worker.pid)
@@ -17,13 +17,18 @@ class RecipeIndredientsAdmin(admin.TabularInline):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     def count_favorite_recipes(self, obj):
-        return Favorite.objects.filter(favorite_recipe=obj).count()
+        return obj.favorites_count
     count_favorite_recipes.short_description = 'Число добавлений в избранное'
 
     def image_tag(self, obj):
+        variants = obj.image_variants
+        if variants.get('source') == obj.image.name:
+            url = obj.image.storage.url(variants['admin'])
+        else:
+            url = obj.image.url
         return format_html(
             '<img src="{0}" style="max-width: 50%"/>',
-            obj.image.url
+            url
         )
     image_tag.short_description = 'Превью'
 
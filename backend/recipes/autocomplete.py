@@ -0,0 +1,89 @@
+import threading
+
+from api_foodgram.replicas import use_primary
+from .catalog import get_catalog_version
+from .models import Ingredients
+
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_MAX_LIMIT = 100
+
+
+class TrieNode:
+    __slots__ = ('children', 'ingredients')
+
+    def __init__(self):
+        self.children = {}
+        self.ingredients = []
+
+
+class IngredientsTrie:
+
+    def __init__(self, ingredients, version=None,
+                 max_limit=AUTOCOMPLETE_MAX_LIMIT):
+        self.version = version
+        self.root = TrieNode()
+        ingredients = sorted(
+            ingredients,
+            key=lambda ingredient: (ingredient['name'].lower(),
+                                    ingredient['id'])
+        )
+        for ingredient in ingredients:
+            node = self.root
+            for char in ingredient['name'].lower():
+                node = node.children.setdefault(char, TrieNode())
+            node.ingredients.append(ingredient)
+        self.collect_top(max_limit)
+
+    def collect_top(self, max_limit):
+        # Каждый узел хранит первые max_limit ингредиентов своего
+        # поддерева, поэтому поиск сводится к спуску по префиксу.
+        stack = [(self.root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not children_done:
+                stack.append((node, True))
+                stack.extend(
+                    (child, False) for child in node.children.values()
+                )
+                continue
+            for child in node.children.values():
+                if len(node.ingredients) >= max_limit:
+                    break
+                node.ingredients.extend(
+                    child.ingredients[:max_limit - len(node.ingredients)]
+                )
+            del node.ingredients[max_limit:]
+
+    def search(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        node = self.root
+        for char in prefix.lower():
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.ingredients[:limit]
+
+
+_trie = None
+_trie_lock = threading.Lock()
+
+
+def build_ingredients_trie(version):
+    global _trie
+    with _trie_lock:
+        if _trie is None or _trie.version != version:
+            with use_primary():
+                _trie = IngredientsTrie(
+                    Ingredients.objects.values(
+                        'id',
+                        'name',
+                        'measurement_unit'
+                    ),
+                    version=version
+                )
+
+
+def get_ingredients_trie():
+    version, _ = get_catalog_version('ingredients')
+    if _trie is None or _trie.version != version:
+        build_ingredients_trie(version)
+    return _trie
@@ -0,0 +1,71 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from api_foodgram.replicas import reads_replica
+
+VERSION_KEY = '{0}:version'
+RECIPE_REPRESENTATION_KEY = 'recipe:{0}:{1}:{2}:{3}:{4}:{5}'
+
+
+def get_versions(names):
+    keys = {name: VERSION_KEY.format(name) for name in names}
+    versions = cache.get_many(keys.values())
+    missing = [key for key in keys.values() if key not in versions]
+    if missing:
+        # Новая версия начинается с текущего времени, чтобы после
+        # вытеснения из кэша она не совпала с уже использованной.
+        for key in missing:
+            cache.add(key, time.time_ns(), timeout=None)
+        versions.update(cache.get_many(missing))
+    return {name: versions.get(key, 0) for name, key in keys.items()}
+
+
+def bump_version(name):
+    # Версия - время изменения, по ней видно, могла ли реплика его получить.
+    key = VERSION_KEY.format(name)
+    cache.set(key, max(time.time_ns(), cache.get(key, 0) + 1), timeout=None)
+
+
+def is_version_settled(version):
+    return time.time_ns() - version > settings.REPLICA_MAX_LAG * 10 ** 9
+
+
+def get_recipe_representation_keys(recipes, base_url):
+    versions = get_versions(
+        {f'recipe:{recipe.id}' for recipe in recipes}
+        | {f'user:{recipe.author_id}' for recipe in recipes}
+        | {'catalog:tags', 'catalog:ingredients'}
+    )
+    keys = {}
+    fillable = set()
+    replica = reads_replica()
+    for recipe in recipes:
+        recipe_versions = (
+            versions[f'recipe:{recipe.id}'],
+            versions[f'user:{recipe.author_id}'],
+            versions['catalog:tags'],
+            versions['catalog:ingredients'],
+        )
+        keys[recipe.id] = RECIPE_REPRESENTATION_KEY.format(
+            recipe.id,
+            *recipe_versions,
+            base_url
+        )
+        # Данные с реплики кладём в кэш, только когда она заведомо догнала
+        # все изменения, поднявшие версии.
+        if not replica or all(map(is_version_settled, recipe_versions)):
+            fillable.add(keys[recipe.id])
+    return keys, fillable
+
+
+def get_recipe_representations(keys):
+    return cache.get_many(keys)
+
+
+def set_recipe_representations(representations):
+    cache.set_many(
+        representations,
+        timeout=settings.RECIPE_CACHE_TIMEOUT
+    )
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from api_foodgram.replicas import use_primary
+from .caching import bump_version, get_versions
+from .models import Tags
+
+CATALOG_MODIFIED_KEY = 'catalog:{0}:modified'
+CATALOG_RENDERED_MAX_SIZE = 256
+
+_tag_ids = (None, {})
+_tag_ids_lock = threading.Lock()
+
+
+def get_catalog_version(name):
+    version = get_versions([f'catalog:{name}'])[f'catalog:{name}']
+    modified_key = CATALOG_MODIFIED_KEY.format(name)
+    modified = cache.get(modified_key)
+    if modified is None:
+        # Воркеры одновременно начинают отсчёт, в общем кэше остаётся
+        # значение первого из них, его и отдаём в Last-Modified.
+        cache.add(modified_key, time.time(), timeout=None)
+        modified = cache.get(modified_key, time.time())
+    return version, modified
+
+
+def bump_catalog_version(name):
+    bump_version(f'catalog:{name}')
+    cache.set(CATALOG_MODIFIED_KEY.format(name), time.time(), timeout=None)
+
+
+def get_tag_ids_by_slug():
+    global _tag_ids
+    version, _ = get_catalog_version('tags')
+    tag_ids = _tag_ids
+    if tag_ids[0] != version:
+        with _tag_ids_lock:
+            if _tag_ids[0] != version:
+                with use_primary():
+                    _tag_ids = (
+                        version,
+                        dict(Tags.objects.values_list('slug', 'id'))
+                    )
+            tag_ids = _tag_ids
+    return tag_ids[1]
+
+
+class CatalogCacheMixin:
+    catalog_name = None
+    rendered = OrderedDict()
+    rendered_lock = threading.Lock()
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        version, modified = get_catalog_version(self.catalog_name)
+        path = request.get_full_path()
+        key = (self.catalog_name, version, path)
+        etag = quote_etag('{0}-{1}-{2}'.format(
+            self.catalog_name,
+            version,
+            hashlib.md5(path.encode()).hexdigest()[:12]
+        ))
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(modified)
+        )
+        if response is None:
+            with self.rendered_lock:
+                body = self.rendered.get(key)
+                if body is not None:
+                    self.rendered.move_to_end(key)
+            if body is None:
+                with use_primary():
+                    data = super().list(request, *args, **kwargs).data
+                body = request.accepted_renderer.render(data)
+                with self.rendered_lock:
+                    self.rendered[key] = body
+                    while len(self.rendered) > CATALOG_RENDERED_MAX_SIZE:
+                        self.rendered.popitem(last=False)
+            response = HttpResponse(
+                body,
+                content_type=request.accepted_renderer.media_type
+            )
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        response['Cache-Control'] = 'no-cache'
+        return response
@@ -0,0 +1,45 @@
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import CustomUser, Subscription
+from .models import Favorite, Recipe, ShoppingCart
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def recalculate_recipe_counters(recipes):
+    return recipes.update(
+        favorites_count=count_subquery(
+            Favorite.objects.all(),
+            'favorite_recipe'
+        ),
+        shopping_carts_count=count_subquery(
+            ShoppingCart.objects.all(),
+            'shopping_cart_recipe'
+        )
+    )
+
+
+def recalculate_user_counters(users):
+    return users.update(
+        recipes_count=count_subquery(Recipe.objects.all(), 'author'),
+        followers_count=count_subquery(Subscription.objects.all(), 'author')
+    )
+
+
+def recalculate_counters(recipe_ids=(), user_ids=()):
+    if recipe_ids:
+        recalculate_recipe_counters(Recipe.objects.filter(pk__in=recipe_ids))
+    if user_ids:
+        recalculate_user_counters(CustomUser.objects.filter(pk__in=user_ids))
@@ -0,0 +1,277 @@
+import csv
+import logging
+import struct
+import zlib
+
+from django.conf import settings
+
+from .fonts import load_font, subset_font
+
+logger = logging.getLogger(__name__)
+
+SHOPPING_CART_MSG = 'Вот необходимые для приготовления блюд ингредиенты:'
+SHOPPING_CART_CSV_HEADER = (
+    'Ингредиент',
+    'Количество',
+    'Единица измерения'
+)
+
+PDF_PAGE_SIZE = (595, 842)
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 11
+PDF_LEADING = 16
+PDF_LINES_PER_PAGE = (PDF_PAGE_SIZE[1] - 2 * PDF_MARGIN) // PDF_LEADING
+PDF_SUBSET_TAG = 'FOODGR'
+PDF_TO_UNICODE_CHUNK = 100
+PDF_TO_UNICODE_CMAP = (
+    b'/CIDInit /ProcSet findresource begin\n'
+    b'12 dict begin\nbegincmap\n'
+    b'/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> '
+    b'def\n/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n'
+    b'1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n'
+    b'%s\nendcmap\nCMapName currentdict /CMap defineresource pop\n'
+    b'end\nend'
+)
+
+
+class ExportUnavailableError(Exception):
+    pass
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def shopping_cart_lines(shopping_cart):
+    for ingredient in shopping_cart:
+        yield ' - '.join(
+            (
+                ingredient['ingredients__name'],
+                str(ingredient['total_amount'])
+                + ingredient['ingredients__measurement_unit']
+            )
+        )
+
+
+def export_txt(user, shopping_cart):
+    yield f'{user.username},\n{SHOPPING_CART_MSG}\n'
+    separator = ''
+    for line in shopping_cart_lines(shopping_cart):
+        yield separator + line
+        separator = ';\n'
+    yield '.'
+
+
+def export_csv(user, shopping_cart):
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(SHOPPING_CART_CSV_HEADER)
+    for ingredient in shopping_cart:
+        yield writer.writerow(
+            (
+                ingredient['ingredients__name'],
+                ingredient['total_amount'],
+                ingredient['ingredients__measurement_unit']
+            )
+        )
+
+
+def pdf_text(font, used, value):
+    # Шрифт подключён с кодировкой Identity-H: в тексте номера глифов.
+    glyphs = []
+    for char in value:
+        glyph = font['cmap'].get(ord(char), 0)
+        if glyph:
+            used.setdefault(glyph, char)
+        glyphs.append(b'%04X' % glyph)
+    return b''.join(glyphs)
+
+
+def pdf_stream(content, extra=b''):
+    return b'<< /Length %d%s >>\nstream\n%s\nendstream' % (
+        len(content),
+        extra,
+        content
+    )
+
+
+def pdf_page(font, used, lines):
+    return pdf_stream(
+        b'BT /F1 %d Tf %d TL %d %d Td\n' % (
+            PDF_FONT_SIZE,
+            PDF_LEADING,
+            PDF_MARGIN,
+            PDF_PAGE_SIZE[1] - PDF_MARGIN
+        ) + b''.join(
+            b'<' + pdf_text(font, used, line) + b'> Tj T*\n' for line in lines
+        ) + b'ET'
+    )
+
+
+def pdf_to_unicode(used):
+    glyphs = sorted(used)
+    blocks = []
+    for index in range(0, len(glyphs), PDF_TO_UNICODE_CHUNK):
+        chunk = glyphs[index:index + PDF_TO_UNICODE_CHUNK]
+        blocks.append(b'%d beginbfchar\n%s\nendbfchar' % (
+            len(chunk),
+            b'\n'.join(
+                b'<%04X> <%s>' % (
+                    glyph,
+                    used[glyph].encode('utf-16-be').hex().upper().encode()
+                )
+                for glyph in chunk
+            )
+        ))
+    return pdf_stream(PDF_TO_UNICODE_CMAP % b'\n'.join(blocks))
+
+
+def get_pdf_font():
+    try:
+        return load_font(settings.PDF_FONT_PATH)
+    except (OSError, KeyError, IndexError, ValueError, struct.error):
+        logger.exception(
+            'Не удалось загрузить шрифт для PDF: %s',
+            settings.PDF_FONT_PATH
+        )
+        raise ExportUnavailableError(
+            'Выгрузка в PDF недоступна: на сервере нет шрифта с кириллицей.'
+        )
+
+
+def export_pdf(user, shopping_cart):
+    # Шрифт читаем до первого байта ответа: ошибка внутри потока оборвала
+    # бы PDF, когда статус 200 уже отправлен.
+    return pdf_document(get_pdf_font(), user, shopping_cart)
+
+
+def pdf_document(font, user, shopping_cart):
+    # Базовые шрифты PDF не содержат кириллицы, поэтому встраиваем TrueType
+    # только с теми глифами, что попали в документ.
+    used = {}
+    offsets = {}
+    position = 0
+    kids = []
+    next_number = 4
+
+    def write_object(number, body):
+        nonlocal position
+        offsets[number] = position
+        chunk = b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        position += len(chunk)
+        return chunk
+
+    def write_page(lines):
+        nonlocal next_number
+        content_number, page_number = next_number, next_number + 1
+        next_number += 2
+        kids.append(page_number)
+        return write_object(
+            content_number,
+            pdf_page(font, used, lines)
+        ) + write_object(
+            page_number,
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (
+                PDF_PAGE_SIZE[0],
+                PDF_PAGE_SIZE[1],
+                content_number
+            )
+        )
+
+    def write_font():
+        nonlocal next_number
+        cid_number, descriptor_number, file_number, to_unicode_number = range(
+            next_number, next_number + 4
+        )
+        next_number += 4
+        base_font = f'{PDF_SUBSET_TAG}+{font["name"]}'.encode()
+        font_file = subset_font(font, used)
+        return b''.join((
+            write_object(
+                3,
+                b'<< /Type /Font /Subtype /Type0 /BaseFont /%s '
+                b'/Encoding /Identity-H /DescendantFonts [%d 0 R] '
+                b'/ToUnicode %d 0 R >>' % (
+                    base_font,
+                    cid_number,
+                    to_unicode_number
+                )
+            ),
+            write_object(
+                cid_number,
+                b'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /%s '
+                b'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) '
+                b'/Supplement 0 >> /FontDescriptor %d 0 R '
+                b'/CIDToGIDMap /Identity /DW %d /W [%s] >>' % (
+                    base_font,
+                    descriptor_number,
+                    font['widths'][0],
+                    b' '.join(
+                        b'%d [%d]' % (glyph, font['widths'][glyph])
+                        for glyph in sorted(used)
+                    )
+                )
+            ),
+            write_object(
+                descriptor_number,
+                b'<< /Type /FontDescriptor /FontName /%s /Flags 32 '
+                b'/FontBBox [%s] /ItalicAngle 0 /Ascent %d /Descent %d '
+                b'/CapHeight %d /StemV 80 /FontFile2 %d 0 R >>' % (
+                    base_font,
+                    b' '.join(b'%d' % value for value in font['bbox']),
+                    font['ascent'],
+                    font['descent'],
+                    font['ascent'],
+                    file_number
+                )
+            ),
+            write_object(
+                file_number,
+                pdf_stream(
+                    zlib.compress(font_file),
+                    b' /Length1 %d /Filter /FlateDecode' % len(font_file)
+                )
+            ),
+            write_object(to_unicode_number, pdf_to_unicode(used))
+        ))
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header
+    yield write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+    lines = [f'{user.username},', SHOPPING_CART_MSG, '']
+    for line in shopping_cart_lines(shopping_cart):
+        lines.append(line)
+        if len(lines) == PDF_LINES_PER_PAGE:
+            yield write_page(lines)
+            lines = []
+    if lines or not kids:
+        yield write_page(lines)
+    # Глифы известны только после всех страниц, поэтому шрифт идёт в конце.
+    yield write_font()
+    yield write_object(
+        2,
+        b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % kid for kid in kids),
+            len(kids)
+        )
+    )
+    xref = [b'xref\n0 %d\n0000000000 65535 f \n' % next_number]
+    xref += [
+        b'%010d 00000 n \n' % offsets[number]
+        for number in range(1, next_number)
+    ]
+    yield b''.join(xref) + (
+        b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            next_number,
+            position
+        )
+    )
+
+
+SHOPPING_CART_EXPORTERS = {
+    'txt': (export_txt, 'text/plain; charset=utf-8'),
+    'csv': (export_csv, 'text/csv; charset=utf-8'),
+    'pdf': (export_pdf, 'application/pdf')
+}
@@ -0,0 +1,118 @@
+import base64
+import binascii
+import uuid
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+from .images import IMAGE_VARIANTS
+
+# Кусок base64-строки, кратный 4 символам; после декодирования это 192 КиБ.
+BASE64_CHUNK_SIZE = 256 * 1024
+IMAGE_FORMATS = {
+    'JPEG': ('jpg', 'image/jpeg'),
+    'PNG': ('png', 'image/png'),
+    'GIF': ('gif', 'image/gif'),
+    'WEBP': ('webp', 'image/webp'),
+}
+
+
+class RecipeImageField(serializers.ImageField):
+    default_error_messages = {
+        'invalid_base64': 'Картинка должна быть файлом или строкой base64.',
+        'too_large': 'Размер картинки больше {max_bytes} байт.',
+        'too_many_pixels': 'Разрешение картинки больше {max_pixels} точек.',
+        'invalid_format': 'Допустимые форматы картинки: {formats}.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = self.decode_base64(data)
+        elif not isinstance(data, UploadedFile):
+            self.fail('invalid_base64')
+        if data.size > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.fail('too_large', max_bytes=settings.RECIPE_IMAGE_MAX_BYTES)
+        self.check_header(data)
+        return super().to_internal_value(data)
+
+    def decode_base64(self, data):
+        offset = 0
+        if data.startswith('data:'):
+            offset = data.find(';base64,') + len(';base64,')
+            if offset < len(';base64,'):
+                self.fail('invalid_base64')
+        # Клиенты переносят длинные строки base64 (MIME, PEM): пробелы и
+        # переводы строк выбрасываем, иначе куски не будут кратны 4.
+        data = ''.join(data[offset:].split())
+        size = len(data) * 3 // 4 - data[-2:].count('=')
+        if size > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.fail('too_large', max_bytes=settings.RECIPE_IMAGE_MAX_BYTES)
+        upload = TemporaryUploadedFile(
+            str(uuid.uuid4()),
+            'application/octet-stream',
+            size,
+            None
+        )
+        try:
+            for start in range(0, len(data), BASE64_CHUNK_SIZE):
+                upload.write(base64.b64decode(
+                    data[start:start + BASE64_CHUNK_SIZE],
+                    validate=True
+                ))
+        except (binascii.Error, ValueError):
+            upload.close()
+            self.fail('invalid_base64')
+        upload.size = upload.tell()
+        upload.seek(0)
+        return upload
+
+    def check_header(self, upload):
+        try:
+            with Image.open(upload) as image:
+                image_format = image.format
+                width, height = image.size
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            upload.seek(0)
+        if image_format not in IMAGE_FORMATS:
+            self.fail('invalid_format', formats=', '.join(IMAGE_FORMATS))
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self.fail(
+                'too_many_pixels',
+                max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS
+            )
+        if isinstance(upload, TemporaryUploadedFile):
+            extension, content_type = IMAGE_FORMATS[image_format]
+            upload.name = f'{upload.name}.{extension}'
+            upload.content_type = content_type
+
+
+class ImageVariantsField(serializers.Field):
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return {}
+        variants = recipe.image_variants
+        if variants.get('source') != recipe.image.name:
+            variants = {}
+        request = self.context.get('request')
+        urls = {}
+        for variant in IMAGE_VARIANTS:
+            name = variants.get(variant)
+            url = (
+                recipe.image.storage.url(name) if name
+                else recipe.image.url
+            )
+            urls[variant] = (
+                request.build_absolute_uri(url) if request is not None
+                else url
+            )
+        return urls
@@ -1,14 +1,17 @@
 import django_filters as filters
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Lower
 
 from users.models import CustomUser
-from .models import Ingredients, Recipe, Tags
+from .catalog import get_tag_ids_by_slug
+from .models import Ingredients, Recipe
+from .search import search_recipes
 
 
 class RecipesFilter(filters.FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tags.objects.all()
+    tags = filters.CharFilter(
+        field_name='tags',
+        method='get_tags'
     )
     is_favorited = filters.BooleanFilter(
         field_name='favorite_recipe',
@@ -19,6 +22,22 @@ class RecipesFilter(filters.FilterSet):
         method='get_is_in_shopping_cart'
     )
     author = filters.ModelChoiceFilter(queryset=CustomUser.objects.all())
+    search = filters.CharFilter(method='get_search')
+
+    def get_tags(self, queryset, name, value):
+        tag_ids_by_slug = get_tag_ids_by_slug()
+        tag_ids = [
+            tag_ids_by_slug[slug] for slug in self.data.getlist(name)
+            if slug in tag_ids_by_slug
+        ]
+        return queryset.filter(
+            Exists(
+                Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'),
+                    tags_id__in=tag_ids
+                )
+            )
+        )
 
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated:
@@ -42,22 +61,33 @@ class RecipesFilter(filters.FilterSet):
             )
         return queryset
 
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     class Meta:
         model = Recipe
         fields = (
             'tags',
             'is_favorited',
             'is_in_shopping_cart',
-            'author'
+            'author',
+            'search'
         )
 
 
 class IngredientsFilter(filters.FilterSet):
     name = filters.CharFilter(
         field_name='name',
-        lookup_expr='istartswith'
+        method='get_name'
     )
 
+    def get_name(self, queryset, name, value):
+        return queryset.annotate(
+            name_lower=Lower('name')
+        ).filter(
+            name_lower__startswith=value.lower()
+        )
+
     class Meta:
         fields = (
             'name',
@@ -0,0 +1,178 @@
+import functools
+import os
+import struct
+
+# Таблицы, которые нужны просмотрщику для TrueType внутри PDF (CIDFontType2):
+# символы он ищет по номерам глифов, поэтому cmap и name не встраиваем.
+EMBEDDED_TABLES = (
+    b'cvt ', b'fpgm', b'glyf', b'head', b'hhea', b'hmtx', b'loca', b'maxp',
+    b'prep'
+)
+COMPOSITE_MORE_COMPONENTS = 0x0020
+COMPOSITE_ARGS_ARE_WORDS = 0x0001
+COMPOSITE_SCALE_SIZES = ((0x0008, 2), (0x0040, 4), (0x0080, 8))
+
+
+def read_cmap(data, offset):
+    # Нужна только таблица Юникода (платформа 3, кодировка 1, формат 4):
+    # кириллица и латиница лежат в базовой плоскости.
+    _, count = struct.unpack_from('>HH', data, offset)
+    for index in range(count):
+        platform, encoding, subtable = struct.unpack_from(
+            '>HHI', data, offset + 4 + index * 8
+        )
+        start = offset + subtable
+        if (platform, encoding) == (3, 1) and struct.unpack_from(
+            '>H', data, start
+        )[0] == 4:
+            break
+    else:
+        raise ValueError('В шрифте нет таблицы символов Юникода.')
+    segments = struct.unpack_from('>H', data, start + 6)[0] // 2
+    ends = struct.unpack_from(f'>{segments}H', data, start + 14)
+    starts_at = start + 16 + segments * 2
+    starts = struct.unpack_from(f'>{segments}H', data, starts_at)
+    deltas_at = starts_at + segments * 2
+    deltas = struct.unpack_from(f'>{segments}h', data, deltas_at)
+    ranges_at = deltas_at + segments * 2
+    ranges = struct.unpack_from(f'>{segments}H', data, ranges_at)
+    cmap = {}
+    for index in range(segments):
+        for code in range(starts[index], min(ends[index], 0xfffe) + 1):
+            if ranges[index]:
+                glyph = struct.unpack_from(
+                    '>H',
+                    data,
+                    ranges_at + index * 2 + ranges[index]
+                    + (code - starts[index]) * 2
+                )[0]
+                if glyph:
+                    glyph = (glyph + deltas[index]) & 0xffff
+            else:
+                glyph = (code + deltas[index]) & 0xffff
+            if glyph:
+                cmap[code] = glyph
+    return cmap
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(path):
+    with open(path, 'rb') as source:
+        data = source.read()
+    tables = {}
+    offsets = {}
+    count = struct.unpack_from('>H', data, 4)[0]
+    for index in range(count):
+        tag, _, offset, length = struct.unpack_from(
+            '>4sIII', data, 12 + index * 16
+        )
+        tables[tag] = data[offset:offset + length]
+        offsets[tag] = offset
+    head = tables[b'head']
+    units = struct.unpack_from('>H', head, 18)[0]
+    bbox = struct.unpack_from('>4h', head, 36)
+    long_loca = struct.unpack_from('>h', head, 50)[0]
+    glyphs = struct.unpack_from('>H', tables[b'maxp'], 4)[0]
+    ascent, descent = struct.unpack_from('>hh', tables[b'hhea'], 4)
+    metrics = struct.unpack_from('>H', tables[b'hhea'], 34)[0]
+    advances = struct.unpack_from(f'>{metrics * 2}H', tables[b'hmtx'])[::2]
+    loca = tables[b'loca']
+    if long_loca:
+        loca = struct.unpack_from(f'>{glyphs + 1}I', loca)
+    else:
+        loca = [
+            offset * 2
+            for offset in struct.unpack_from(f'>{glyphs + 1}H', loca)
+        ]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return {
+        'name': ''.join(char for char in name if char.isalnum()),
+        'tables': tables,
+        'cmap': read_cmap(data, offsets[b'cmap']),
+        'loca': loca,
+        'widths': [
+            round(advances[min(glyph, metrics - 1)] * 1000 / units)
+            for glyph in range(glyphs)
+        ],
+        'bbox': [round(value * 1000 / units) for value in bbox],
+        'ascent': round(ascent * 1000 / units),
+        'descent': round(descent * 1000 / units),
+    }
+
+
+def glyph_data(font, glyph):
+    loca = font['loca']
+    return font['tables'][b'glyf'][loca[glyph]:loca[glyph + 1]]
+
+
+def glyph_components(font, glyph):
+    data = glyph_data(font, glyph)
+    if len(data) < 10 or struct.unpack_from('>h', data)[0] >= 0:
+        return
+    offset = 10
+    flags = COMPOSITE_MORE_COMPONENTS
+    while flags & COMPOSITE_MORE_COMPONENTS:
+        flags, component = struct.unpack_from('>HH', data, offset)
+        yield component
+        offset += 4 + (4 if flags & COMPOSITE_ARGS_ARE_WORDS else 2)
+        for flag, size in COMPOSITE_SCALE_SIZES:
+            if flags & flag:
+                offset += size
+                break
+
+
+def table_checksum(data):
+    data += b'\0' * (-len(data) % 4)
+    return sum(struct.unpack(f'>{len(data) // 4}I', data)) & 0xffffffff
+
+
+def subset_font(font, glyphs):
+    # Номера глифов сохраняем, а контуры неиспользуемых выбрасываем: так
+    # текст страниц ссылается на те же номера, а файл занимает килобайты.
+    keep = {0}
+    pending = list(glyphs)
+    while pending:
+        glyph = pending.pop()
+        if glyph not in keep:
+            keep.add(glyph)
+            pending.extend(glyph_components(font, glyph))
+    glyf = bytearray()
+    loca = [0]
+    for glyph in range(len(font['widths'])):
+        if glyph in keep:
+            glyf += glyph_data(font, glyph)
+            glyf += b'\0' * (-len(glyf) % 4)
+        loca.append(len(glyf))
+    tables = dict(font['tables'])
+    tables[b'glyf'] = bytes(glyf)
+    tables[b'loca'] = struct.pack(f'>{len(loca)}I', *loca)
+    # Длинный формат loca и нулевая контрольная сумма всего файла.
+    head = bytearray(tables[b'head'])
+    head[8:12] = b'\0\0\0\0'
+    head[50:52] = struct.pack('>h', 1)
+    tables[b'head'] = bytes(head)
+    tags = [tag for tag in EMBEDDED_TABLES if tag in tables]
+    offset = 12 + len(tags) * 16
+    selector = len(tags).bit_length() - 1
+    directory = [
+        struct.pack(
+            '>IHHHH',
+            0x00010000,
+            len(tags),
+            16 << selector,
+            selector,
+            len(tags) * 16 - (16 << selector)
+        )
+    ]
+    body = []
+    for tag in tags:
+        data = tables[tag]
+        directory.append(
+            struct.pack(
+                '>4sIII', tag, table_checksum(data), offset, len(data)
+            )
+        )
+        data += b'\0' * (-len(data) % 4)
+        body.append(data)
+        offset += len(data)
+    return b''.join(directory + body)
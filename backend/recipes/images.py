@@ -0,0 +1,91 @@
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from api_foodgram.executors import get_executor
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    'card': (480, 480),
+    'detail': (1200, 1200),
+    'admin': (200, 200),
+}
+IMAGE_VARIANTS_DIR = 'recipes/variants/'
+IMAGE_VARIANT_QUALITY = 80
+
+
+def get_variant_format():
+    image_format = settings.RECIPE_IMAGE_VARIANT_FORMAT.upper()
+    if image_format == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return image_format
+
+
+def render_variant(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    content = io.BytesIO()
+    variant.save(
+        content,
+        image_format,
+        quality=IMAGE_VARIANT_QUALITY,
+        optimize=True
+    )
+    return content.getvalue()
+
+
+def build_image_variants(recipe_id, image_name):
+    storage = Recipe._meta.get_field('image').storage
+    image_format = get_variant_format()
+    extension = 'webp' if image_format == 'WEBP' else 'jpg'
+    try:
+        with storage.open(image_name) as image_file:
+            image = ImageOps.exif_transpose(Image.open(image_file))
+            image.load()
+        variants = {'source': image_name}
+        for variant, size in IMAGE_VARIANTS.items():
+            variants[variant] = storage.save(
+                f'{IMAGE_VARIANTS_DIR}{variant}.{extension}',
+                ContentFile(render_variant(image, size, image_format))
+            )
+        with transaction.atomic():
+            recipe = Recipe.objects.select_for_update().filter(
+                pk=recipe_id,
+                image=image_name
+            ).only('image', 'image_variants').first()
+            if recipe is None:
+                return
+            recipe.image_variants = variants
+            recipe.save(update_fields=['image_variants'])
+    except Exception:
+        logger.exception(
+            'Не удалось подготовить картинки рецепта %s', recipe_id
+        )
+    finally:
+        if settings.RECIPE_IMAGE_WORKERS:
+            connection.close()
+
+
+def schedule_image_variants(recipe):
+    recipe_id, image_name = recipe.id, recipe.image.name
+    if settings.RECIPE_IMAGE_WORKERS:
+        transaction.on_commit(lambda: get_executor(
+            'recipe-images',
+            settings.RECIPE_IMAGE_WORKERS
+        ).submit(
+            build_image_variants,
+            recipe_id,
+            image_name
+        ))
+    else:
+        transaction.on_commit(
+            lambda: build_image_variants(recipe_id, image_name)
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import build_image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Готовит уменьшенные копии картинок рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать копии даже если они уже есть.'
+        )
+
+    def handle(self, *args, **options):
+        built = 0
+        recipes = Recipe.objects.exclude(image='').only(
+            'id',
+            'image',
+            'image_variants'
+        )
+        for recipe in recipes.iterator():
+            if (
+                options['force']
+                or recipe.image_variants.get('source') != recipe.image.name
+            ):
+                build_image_variants(recipe.id, recipe.image.name)
+                built += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {built}.'
+        ))
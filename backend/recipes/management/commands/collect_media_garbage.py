@@ -0,0 +1,145 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.models import Recipe, StoredFile
+
+GRACE_MINUTES = 60
+TRASH_PREFIX = '.trash-'
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки рецептов, на которые больше нет ссылок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-minutes',
+            type=int,
+            default=GRACE_MINUTES,
+            help='Не трогать файлы, изменённые за последние N минут.'
+        )
+        parser.add_argument(
+            '--scan',
+            action='store_true',
+            help='Пересчитать ссылки по рецептам и проверить все файлы '
+                 'на диске.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено.'
+        )
+
+    def handle(self, *args, **options):
+        self.storage = Recipe._meta.get_field('image').storage
+        self.dry_run = options['dry_run']
+        self.cutoff = timezone.now() - timedelta(
+            minutes=options['grace_minutes']
+        )
+        self.deleted = 0
+        self.freed = 0
+        if options['scan']:
+            self.recount_references()
+        self.collect_unreferenced()
+        if options['scan']:
+            self.collect_untracked()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {self.deleted}, '
+            f'освобождено: {self.freed / 1024 / 1024:.1f} МБ.'
+        ))
+
+    def is_stale(self, path):
+        return os.path.getmtime(path) < self.cutoff.timestamp()
+
+    def delete_file(self, name):
+        path = self.storage.path(name)
+        if not os.path.exists(path):
+            return True
+        if not self.is_stale(path):
+            return False
+        size = os.path.getsize(path)
+        if self.dry_run:
+            self.stdout.write(name)
+        elif not self.remove_stale(path):
+            return False
+        self.deleted += 1
+        self.freed += size
+        return True
+
+    def remove_stale(self, path):
+        # Хранилище продлевает жизнь файлу через os.utime. Отметку,
+        # поставленную до переименования, видно и после него, а
+        # переименованный файл хранилище уже не найдёт и запишет заново.
+        directory, filename = os.path.split(path)
+        trash_path = os.path.join(directory, TRASH_PREFIX + filename)
+        try:
+            os.replace(path, trash_path)
+        except FileNotFoundError:
+            return True
+        if self.is_stale(trash_path):
+            os.remove(trash_path)
+            return True
+        os.replace(trash_path, path)
+        return False
+
+    @transaction.atomic
+    def recount_references(self):
+        references = Counter()
+        recipes = Recipe.objects.only('image', 'image_variants')
+        for recipe in recipes.iterator():
+            references.update(recipe.stored_files())
+        stored_files = {
+            stored_file.name: stored_file
+            for stored_file in StoredFile.objects.select_for_update()
+        }
+        changed = []
+        for name, stored_file in stored_files.items():
+            if stored_file.references != references.get(name, 0):
+                stored_file.references = references.get(name, 0)
+                changed.append(stored_file)
+        StoredFile.objects.bulk_update(changed, ['references'])
+        StoredFile.objects.bulk_create(
+            [
+                StoredFile(name=name, references=count)
+                for name, count in references.items()
+                if name not in stored_files
+            ],
+            ignore_conflicts=True
+        )
+
+    def collect_unreferenced(self):
+        candidates = StoredFile.objects.filter(
+            references=0,
+            modified__lt=self.cutoff
+        ).values_list('pk', flat=True)
+        for pk in list(candidates):
+            with transaction.atomic():
+                stored_file = StoredFile.objects.select_for_update().filter(
+                    pk=pk,
+                    references=0
+                ).first()
+                if stored_file is None:
+                    continue
+                if self.delete_file(stored_file.name) and not self.dry_run:
+                    stored_file.delete()
+
+    def collect_untracked(self):
+        directory = Recipe._meta.get_field('image').upload_to
+        tracked = set(
+            StoredFile.objects.filter(
+                references__gt=0
+            ).values_list('name', flat=True)
+        )
+        root = self.storage.path('')
+        for path, _, filenames in os.walk(self.storage.path(directory)):
+            for filename in filenames:
+                name = os.path.relpath(
+                    os.path.join(path, filename),
+                    root
+                ).replace(os.sep, '/')
+                if name not in tracked:
+                    self.delete_file(name)
@@ -0,0 +1,198 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from recipes.catalog import bump_catalog_version
+from recipes.models import Ingredients, RecipeIngredients
+from recipes.search import schedule_search_update
+
+BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+INGREDIENTS_MODEL = 'recipes.ingredients'
+
+
+def iter_json_array(stream):
+    decoder = json.JSONDecoder()
+    buffer = stream.read(READ_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидался JSON-массив.')
+    position = 1
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = stream.read(READ_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('JSON-файл оборван или повреждён.')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def read_json(stream):
+    for item in iter_json_array(stream):
+        if 'fields' in item:
+            if item.get('model', INGREDIENTS_MODEL) != INGREDIENTS_MODEL:
+                continue
+            yield item.get('pk'), item['fields']
+        else:
+            yield item.get('id'), item
+
+
+def read_csv(stream):
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    if 'name' not in header:
+        yield None, {'name': header[0], 'measurement_unit': header[1]}
+        header = ['name', 'measurement_unit']
+    for row in reader:
+        if row:
+            item = dict(zip(header, row))
+            yield item.get('id') or None, item
+
+
+READERS = {
+    'json': read_json,
+    'csv': read_csv,
+}
+
+
+class Command(BaseCommand):
+    help = 'Загружает справочник ингредиентов из JSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с ингредиентами.')
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Сколько записей сохранять за один запрос.'
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or os.path.splitext(
+            options['path']
+        )[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(
+                'Не удалось определить формат файла, укажите --format.'
+            )
+        self.created = self.updated = self.unchanged = 0
+        self.renamed = []
+        self.existing_keys = None
+        started = time.monotonic()
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            self.load(READERS[file_format](stream), options['batch_size'])
+        elapsed = time.monotonic() - started
+        total = self.created + self.updated + self.unchanged
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано ингредиентов: {total} '
+            f'(новых {self.created}, изменённых {self.updated}, '
+            f'без изменений {self.unchanged}) за {elapsed:.2f} с, '
+            f'{total / max(elapsed, 1e-6):.0f} записей/с.'
+        ))
+
+    @transaction.atomic
+    def load(self, records, batch_size):
+        batch = []
+        for pk, fields in records:
+            batch.append((
+                None if pk is None else int(pk),
+                fields['name'].strip(),
+                fields['measurement_unit'].strip()
+            ))
+            if len(batch) >= batch_size:
+                self.save_batch(batch)
+                batch = []
+        self.save_batch(batch)
+        if self.created or self.updated:
+            self.reset_sequences()
+            transaction.on_commit(lambda: bump_catalog_version('ingredients'))
+        if self.renamed:
+            schedule_search_update(
+                RecipeIngredients.objects.filter(
+                    ingredients_id__in=self.renamed
+                ).values_list('recipe_id', flat=True).distinct()
+            )
+
+    def save_batch(self, batch):
+        with_pk = {
+            pk: (name, unit) for pk, name, unit in batch if pk is not None
+        }
+        without_pk = {
+            (name, unit) for pk, name, unit in batch if pk is None
+        }
+        new = []
+        if with_pk:
+            existing = {
+                pk: (name, unit) for pk, name, unit
+                in Ingredients.objects.filter(pk__in=with_pk).values_list(
+                    'pk',
+                    'name',
+                    'measurement_unit'
+                )
+            }
+            changed = []
+            for pk, (name, unit) in with_pk.items():
+                if pk not in existing:
+                    new.append(Ingredients(
+                        pk=pk,
+                        name=name,
+                        measurement_unit=unit
+                    ))
+                elif existing[pk] != (name, unit):
+                    changed.append(Ingredients(
+                        pk=pk,
+                        name=name,
+                        measurement_unit=unit
+                    ))
+                else:
+                    self.unchanged += 1
+            Ingredients.objects.bulk_update(
+                changed,
+                ['name', 'measurement_unit']
+            )
+            self.updated += len(changed)
+            self.renamed += [ingredient.pk for ingredient in changed]
+        if without_pk:
+            if self.existing_keys is None:
+                self.existing_keys = set(
+                    Ingredients.objects.values_list(
+                        'name',
+                        'measurement_unit'
+                    ).iterator()
+                )
+            for name, unit in without_pk:
+                if (name, unit) in self.existing_keys:
+                    self.unchanged += 1
+                else:
+                    self.existing_keys.add((name, unit))
+                    new.append(Ingredients(name=name, measurement_unit=unit))
+        Ingredients.objects.bulk_create(new)
+        self.created += len(new)
+
+    def reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(
+            no_style(),
+            [Ingredients]
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import (recalculate_recipe_counters,
+                              recalculate_user_counters)
+from recipes.models import Recipe
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики рецептов, избранного и подписок.'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        recipes = recalculate_recipe_counters(Recipe.objects.all())
+        users = recalculate_user_counters(CustomUser.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны: рецептов {recipes}, '
+            f'пользователей {users}.'
+        ))
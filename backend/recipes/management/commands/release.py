@@ -0,0 +1,100 @@
+import os
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import serializers
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Q
+
+from recipes.models import Ingredients
+
+RELEASE_LOCK_ID = 0x666f6f64
+FIXTURES_PATH = os.path.join(settings.BASE_DIR, 'fixtures.json')
+
+
+@contextmanager
+def advisory_lock(lock_id):
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s)', [lock_id])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [lock_id])
+
+
+def row_exists(instance):
+    # Строка уже есть, если совпадает ключ или любое уникальное поле:
+    # администратора могли пересоздать, а тэг - переименовать.
+    model = type(instance)
+    lookup = Q(pk=instance.pk)
+    for field in model._meta.local_fields:
+        if field.unique and not field.primary_key:
+            lookup |= Q(**{field.attname: getattr(instance, field.attname)})
+    return model._default_manager.filter(lookup).exists()
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет миграции, собирает статику и загружает справочники. '
+        'Запускается один раз на выкладку, а не при старте каждого '
+        'контейнера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--skip-static',
+            action='store_true',
+            help='Не запускать collectstatic.'
+        )
+        parser.add_argument(
+            '--skip-fixtures',
+            action='store_true',
+            help='Не загружать ингредиенты, тэги и администратора.'
+        )
+
+    def handle(self, *args, **options):
+        with advisory_lock(RELEASE_LOCK_ID):
+            call_command('migrate', interactive=False, stdout=self.stdout)
+            if not options['skip_static']:
+                call_command(
+                    'collectstatic',
+                    interactive=False,
+                    stdout=self.stdout
+                )
+            if not options['skip_fixtures']:
+                call_command(
+                    'load_ingredients',
+                    FIXTURES_PATH,
+                    stdout=self.stdout
+                )
+                self.load_missing(FIXTURES_PATH)
+        self.stdout.write(self.style.SUCCESS('Выкладка подготовлена.'))
+
+    @transaction.atomic
+    def load_missing(self, path):
+        # loaddata при каждой выкладке перезаписал бы администратора и тэги:
+        # сбросил бы пароль, правки из админки и счётчики, которые
+        # сигналы при raw-сохранении не трогают. Поэтому добавляем только
+        # отсутствующие строки, а счётчики после загрузки пересчитываем.
+        models = set()
+        with open(path, encoding='utf-8') as stream:
+            for item in serializers.deserialize('json', stream):
+                instance = item.object
+                if isinstance(instance, Ingredients) or row_exists(instance):
+                    continue
+                item.save()
+                models.add(type(instance))
+        if not models:
+            return
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        call_command('recalculate_counters', stdout=self.stdout)
@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+RELATIONS = (
+    ('Favorite', 'favorite_user', 'favorite_recipe'),
+    ('ShoppingCart', 'shopping_cart_user', 'shopping_cart_recipe'),
+)
+
+
+def remove_duplicate_relations(apps, schema_editor):
+    # Перед уникальными ограничениями оставляем по одной записи на пару.
+    for model_name, user_field, recipe_field in RELATIONS:
+        model = apps.get_model('recipes', model_name)
+        duplicates = model.objects.values(user_field, recipe_field).annotate(
+            first_id=models.Min('id'),
+            total=models.Count('id')
+        ).filter(total__gt=1)
+        for duplicate in duplicates:
+            model.objects.filter(
+                **{
+                    user_field: duplicate[user_field],
+                    recipe_field: duplicate[recipe_field]
+                }
+            ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_relations,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,74 @@
+from django.db import migrations
+
+SEARCH_CONFIG = 'russian'
+INGREDIENT_NAMES_SQL = (
+    'SELECT {aggregate} FROM recipes_recipeingredients ri '
+    'JOIN recipes_ingredients i ON i.id = ri.ingredients_id '
+    'WHERE ri.recipe_id = recipes_recipe.id'
+)
+POSTGRES_VECTOR_SQL = (
+    "setweight(to_tsvector(%(config)s, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector(%(config)s, coalesce(({ingredients}), '')), 'B') "
+    "|| setweight(to_tsvector(%(config)s, coalesce(text, '')), 'C')"
+).format(
+    ingredients=INGREDIENT_NAMES_SQL.format(
+        aggregate="string_agg(i.name, ' ')"
+    )
+)
+SQLITE_NORMALIZE_SQL = "replace(replace({0}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def create_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe '
+            'ADD COLUMN IF NOT EXISTS search_vector tsvector'
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+            'ON recipes_recipe USING GIN (search_vector)'
+        )
+        schema_editor.execute(
+            f'UPDATE recipes_recipe SET search_vector = {POSTGRES_VECTOR_SQL}',
+            {'config': SEARCH_CONFIG}
+        )
+    elif connection.vendor == 'sqlite':
+        ingredients = INGREDIENT_NAMES_SQL.format(
+            aggregate="group_concat(i.name, ' ')"
+        )
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS '
+            'recipes_recipe_search USING fts5(name, ingredients, text)'
+        )
+        schema_editor.execute('DELETE FROM recipes_recipe_search')
+        schema_editor.execute(
+            'INSERT INTO recipes_recipe_search '
+            '(rowid, name, ingredients, text) SELECT id, {0}, {1}, {2} '
+            'FROM recipes_recipe'.format(
+                SQLITE_NORMALIZE_SQL.format('name'),
+                SQLITE_NORMALIZE_SQL.format(f"coalesce(({ingredients}), '')"),
+                SQLITE_NORMALIZE_SQL.format('text')
+            )
+        )
+
+
+def drop_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector'
+        )
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS recipes_recipe_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_fill_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search, drop_search),
+    ]
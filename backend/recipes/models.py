@@ -1,10 +1,80 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models.functions import Lower, Now, RowNumber
 
-from users.models import CustomUser
+from users.models import (CountersModelMixin, CustomUser, RelationQuerySet,
+                          Subscription)
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipeingredients_set',
+                queryset=RecipeIngredients.objects.select_related(
+                    'ingredients'
+                )
+            )
+        )
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    favorite_user=user,
+                    favorite_recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    shopping_cart_user=user,
+                    shopping_cart_recipe=models.OuterRef('pk')
+                )
+            ),
+            author_is_subscribed=models.Exists(
+                Subscription.objects.filter(
+                    user=user,
+                    author=models.OuterRef('author')
+                )
+            )
+        )
+
+    def recent_by_authors(self, author_ids, limit=None):
+        queryset = self.filter(author__in=author_ids).only(
+            'id',
+            'author',
+            'name',
+            'image',
+            'image_variants',
+            'cooking_time'
+        )
+        if limit is None:
+            return queryset
+        sql, params = queryset.annotate(
+            row_number=models.Window(
+                expression=RowNumber(),
+                partition_by=[models.F('author')],
+                order_by=[
+                    models.F('pub_date').desc(),
+                    models.F('id').desc()
+                ]
+            )
+        ).order_by().query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) ranked '
+            'WHERE ranked.row_number <= %s '
+            'ORDER BY ranked.author_id, ranked.row_number',
+            (*params, limit)
+        )
+
+
+class Recipe(CountersModelMixin, models.Model):
     tags = models.ManyToManyField(
         'Tags',
         related_name='tags',
@@ -36,6 +106,12 @@ class Recipe(models.Model):
         blank=True,
         null=False
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание рецепта',
         null=False
@@ -53,12 +129,40 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Число добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        verbose_name='Число добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'shopping_carts_count')
 
     def __str__(self):
         return (self.name)
 
+    def stored_files(self):
+        names = {
+            name for key, name in self.image_variants.items()
+            if key != 'source'
+        }
+        if self.image:
+            names.add(self.image.name)
+        return names
+
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            )
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -114,6 +218,9 @@ class Ingredients(models.Model):
         return (self.name)
 
     class Meta:
+        indexes = [
+            models.Index(Lower('name'), name='ingredients_name_lower_idx')
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -215,10 +322,18 @@ class Favorite(models.Model):
         null=True
     )
 
+    objects = RelationQuerySet.as_manager()
+
     def __str__(self):
         return ('Избранное')
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['favorite_user', 'favorite_recipe'],
+                name='unique_favorite'
+            )
+        ]
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
 
@@ -239,9 +354,69 @@ class ShoppingCart(models.Model):
         null=True
     )
 
+    objects = RelationQuerySet.as_manager()
+
     def __str__(self):
         return ('Список покупок')
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['shopping_cart_user', 'shopping_cart_recipe'],
+                name='unique_shopping_cart'
+            )
+        ]
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
+
+
+class StoredFileQuerySet(models.QuerySet):
+
+    def change_references(self, old_names, new_names):
+        removed = set(old_names) - set(new_names)
+        added = set(new_names) - set(old_names)
+        if removed:
+            self.filter(name__in=removed, references__gt=0).update(
+                references=models.F('references') - 1,
+                modified=Now()
+            )
+        if added:
+            self.bulk_create(
+                [StoredFile(name=name, references=0) for name in added],
+                ignore_conflicts=True
+            )
+            self.filter(name__in=added).update(
+                references=models.F('references') + 1,
+                modified=Now()
+            )
+
+
+class StoredFile(models.Model):
+    name = models.CharField(
+        max_length=255,
+        verbose_name='Путь к файлу',
+        unique=True
+    )
+    references = models.PositiveIntegerField(
+        verbose_name='Число ссылок',
+        default=0
+    )
+    modified = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
+
+    objects = StoredFileQuerySet.as_manager()
+
+    def __str__(self):
+        return (self.name)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['references', 'modified'],
+                name='stored_file_references_idx'
+            )
+        ]
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
@@ -0,0 +1,62 @@
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class CustomPageNumberPagination(PageNumberPagination):
+    page_size_query_param = 'limit'
+    max_page_size = 150
+    cursor_pagination_class = None
+    # Параметры, чей порядок курсорная пагинация подменила бы своим.
+    cursor_conflicting_params = ()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.cursor_pagination_class is not None and (
+            'cursor' in request.query_params
+            or request.query_params.get('pagination') == 'cursor'
+        ):
+            conflicting = [
+                param for param in self.cursor_conflicting_params
+                if request.query_params.get(param)
+            ]
+            if conflicting:
+                raise ValidationError({
+                    'cursor': [
+                        'Курсорная пагинация несовместима с параметрами: '
+                        '{0}.'.format(', '.join(conflicting))
+                    ]
+                })
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset,
+                request,
+                view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class FeedCursorPagination(CursorPagination):
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 150
+
+
+class SubscriptionsCursorPagination(CursorPagination):
+    ordering = ('-id',)
+    page_size_query_param = 'limit'
+    max_page_size = 150
+
+
+class RecipePagination(CustomPageNumberPagination):
+    cursor_pagination_class = FeedCursorPagination
+    # Поиск сортирует по релевантности, а курсор - по дате публикации.
+    cursor_conflicting_params = ('search',)
+
+
+class SubscriptionsPagination(CustomPageNumberPagination):
+    cursor_pagination_class = SubscriptionsCursorPagination
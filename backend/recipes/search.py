@@ -0,0 +1,125 @@
+import re
+
+from django.db import connections, models, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Ingredients, Recipe, RecipeIngredients
+
+SEARCH_CONFIG = 'russian'
+SEARCH_MAX_TERMS = 8
+SEARCH_FTS_TABLE = 'recipes_recipe_search'
+# В SQLite нет русского стемминга: ищем по префиксам слов, а «ё» приводим
+# к «е» и в документах, и в запросе. «свекл» найдёт «свёклой», но
+# «свекла» её не найдёт. Таблицу и колонку создаёт миграция 0005.
+SQLITE_NORMALIZE_SQL = "replace(replace({0}, 'ё', 'е'), 'Ё', 'Е')"
+
+RECIPE_TABLE = Recipe._meta.db_table
+INGREDIENTS_TABLE = Ingredients._meta.db_table
+RECIPE_INGREDIENTS_TABLE = RecipeIngredients._meta.db_table
+
+INGREDIENT_NAMES_SQL = (
+    f'SELECT {{aggregate}} FROM {RECIPE_INGREDIENTS_TABLE} ri '
+    f'JOIN {INGREDIENTS_TABLE} i ON i.id = ri.ingredients_id '
+    f'WHERE ri.recipe_id = {RECIPE_TABLE}.id'
+)
+POSTGRES_VECTOR_SQL = (
+    "setweight(to_tsvector(%(config)s, coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector(%(config)s, coalesce(({ingredients}), '')), 'B') "
+    "|| setweight(to_tsvector(%(config)s, coalesce(text, '')), 'C')"
+).format(
+    ingredients=INGREDIENT_NAMES_SQL.format(
+        aggregate="string_agg(i.name, ' ')"
+    )
+)
+
+
+def update_search_documents(recipe_ids, using='default'):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f'UPDATE {RECIPE_TABLE} '
+                f'SET search_vector = {POSTGRES_VECTOR_SQL} '
+                'WHERE id = ANY(%(ids)s)',
+                {'config': SEARCH_CONFIG, 'ids': recipe_ids}
+            )
+        elif connection.vendor == 'sqlite':
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            ingredients = INGREDIENT_NAMES_SQL.format(
+                aggregate="group_concat(i.name, ' ')"
+            )
+            cursor.execute(
+                f'DELETE FROM {SEARCH_FTS_TABLE} '
+                f'WHERE rowid IN ({placeholders})',
+                recipe_ids
+            )
+            cursor.execute(
+                f'INSERT INTO {SEARCH_FTS_TABLE} '
+                '(rowid, name, ingredients, text) SELECT id, {0}, {1}, {2} '
+                f'FROM {RECIPE_TABLE} WHERE id IN ({placeholders})'.format(
+                    SQLITE_NORMALIZE_SQL.format('name'),
+                    SQLITE_NORMALIZE_SQL.format(
+                        f"coalesce(({ingredients}), '')"
+                    ),
+                    SQLITE_NORMALIZE_SQL.format('text')
+                ),
+                recipe_ids
+            )
+
+
+def schedule_search_update(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(lambda: update_search_documents(recipe_ids))
+
+
+def search_recipes(queryset, value):
+    terms = re.findall(r'\w+', value.lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        query = ' & '.join(f'{term}:*' for term in terms)
+        match = RawSQL(
+            f'{RECIPE_TABLE}.search_vector @@ to_tsquery(%s, %s)',
+            (SEARCH_CONFIG, query),
+            output_field=models.BooleanField()
+        )
+        rank = RawSQL(
+            f'ts_rank_cd({RECIPE_TABLE}.search_vector, to_tsquery(%s, %s))',
+            (SEARCH_CONFIG, query),
+            output_field=models.FloatField()
+        )
+    elif vendor == 'sqlite':
+        query = ' '.join(
+            '"{0}"*'.format(term.replace('ё', 'е')) for term in terms
+        )
+        match = RawSQL(
+            f'{RECIPE_TABLE}.id IN (SELECT rowid FROM {SEARCH_FTS_TABLE} '
+            f'WHERE {SEARCH_FTS_TABLE} MATCH %s)',
+            (query,),
+            output_field=models.BooleanField()
+        )
+        rank = RawSQL(
+            f'(SELECT -bm25({SEARCH_FTS_TABLE}, 10.0, 4.0, 1.0) '
+            f'FROM {SEARCH_FTS_TABLE} WHERE {SEARCH_FTS_TABLE} MATCH %s '
+            f'AND rowid = {RECIPE_TABLE}.id)',
+            (query,),
+            output_field=models.FloatField()
+        )
+    else:
+        match = models.Q()
+        for term in terms:
+            match &= (
+                models.Q(name__icontains=term)
+                | models.Q(text__icontains=term)
+                | models.Q(ingredients__name__icontains=term)
+            )
+        return queryset.filter(
+            pk__in=Recipe.objects.filter(match).values('pk')
+        )
+    return queryset.filter(match).annotate(
+        search_rank=rank
+    ).order_by('-search_rank', '-pub_date', '-id')
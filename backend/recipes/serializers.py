@@ -1,8 +1,11 @@
-from drf_extra_fields.fields import Base64ImageField
+from django.db import models, transaction
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
-from users.serializers import SmallRecipeSerializer, UsersSerializer
+from users.serializers import UsersSerializer
+from .caching import (get_recipe_representation_keys,
+                      get_recipe_representations,
+                      set_recipe_representations)
+from .fields import ImageVariantsField, RecipeImageField
 from .models import (Favorite, Ingredients, Recipe, RecipeIngredients,
                      ShoppingCart, Tags)
 
@@ -15,6 +18,8 @@ RECIPES_ERROR_MESSAGES = {
         'Вы не добавили ингердиенты.',
     'ingredients_not_unique':
         'Вы добавили одинаковые ингердиенты, удалите их.',
+    'ingredients_not_found':
+        'Ингредиенты с id {0} не найдены.',
     'ingredients_amount_not_positive':
         'Количество ингредиента не может быть отрицательным или нулём.',
     'ingredients_amount_too_big':
@@ -72,6 +77,14 @@ class TagsSerializer(serializers.ModelSerializer):
         model = Tags
 
 
+class CachedRecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        return self.child.to_representation_many(list(data))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     tags = TagsSerializer(
         read_only=True,
@@ -87,12 +100,76 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField()
+
+    user_fields = ('is_favorited', 'is_in_shopping_cart')
 
     class Meta:
-        exclude = ('pub_date', )
+        exclude = ('pub_date', 'favorites_count', 'shopping_carts_count')
         model = Recipe
+        list_serializer_class = CachedRecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, instances):
+        keys, fillable = get_recipe_representation_keys(
+            instances,
+            self.context['request'].build_absolute_uri('/')
+        )
+        cached = get_recipe_representations(keys.values())
+        missing = {}
+        result = []
+        for instance in instances:
+            author_is_subscribed = getattr(
+                instance, 'author_is_subscribed', None
+            )
+            if author_is_subscribed is not None:
+                instance.author.is_subscribed = author_is_subscribed
+            shared = cached.get(keys[instance.id])
+            if shared is None:
+                data = super().to_representation(instance)
+                if keys[instance.id] in fillable:
+                    missing[keys[instance.id]] = self.get_shared_data(data)
+                result.append(data)
+                continue
+            result.append(self.merge_user_data(instance, shared))
+        if missing:
+            set_recipe_representations(missing)
+        return result
+
+    def get_shared_data(self, data):
+        shared = {
+            key: value for key, value in data.items()
+            if key not in self.user_fields
+        }
+        shared['author'] = {
+            key: value for key, value in data['author'].items()
+            if key != 'is_subscribed'
+        }
+        return shared
+
+    def merge_user_data(self, instance, shared):
+        data = {}
+        for field_name in self.fields:
+            if field_name in self.user_fields:
+                data[field_name] = getattr(self, f'get_{field_name}')(
+                    instance
+                )
+            else:
+                data[field_name] = shared[field_name]
+        data['author'] = dict(
+            shared['author'],
+            is_subscribed=self.fields['author'].get_is_subscribed(
+                instance.author
+            )
+        )
+        return data
 
     def get_is_favorited(self, instance):
+        is_favorited = getattr(instance, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
         user = self.context['request'].user
         if user.is_authenticated:
             return Favorite.objects.filter(
@@ -102,6 +179,9 @@ class RecipeSerializer(serializers.ModelSerializer):
         return False
 
     def get_is_in_shopping_cart(self, instance):
+        is_in_shopping_cart = getattr(instance, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
         user = self.context['request'].user
         if user.is_authenticated:
             return ShoppingCart.objects.filter(
@@ -114,7 +194,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 class CreateOrUpdateRecipeSerializer(serializers.ModelSerializer):
     author = UsersSerializer(read_only=True)
     ingredients = RecipeIngredientsCreateSerializer(many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
     cooking_time = serializers.IntegerField()
 
     class Meta:
@@ -122,8 +202,8 @@ class CreateOrUpdateRecipeSerializer(serializers.ModelSerializer):
         model = Recipe
 
     def validate(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        cooking_time = self.initial_data.get('cooking_time')
+        ingredients = data.get('ingredients')
+        cooking_time = data.get('cooking_time')
         if int(cooking_time) <= 0:
             raise serializers.ValidationError(
                 RECIPES_ERROR_MESSAGES['cooking_time_not_positive']
@@ -153,26 +233,44 @@ class CreateOrUpdateRecipeSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     RECIPES_ERROR_MESSAGES['ingredients_amount_too_big']
                 )
+        ingredients_by_id = Ingredients.objects.in_bulk(
+            [ingredient['id'] for ingredient in ingredients]
+        )
+        not_found = [
+            str(ingredient['id']) for ingredient in ingredients
+            if ingredient['id'] not in ingredients_by_id
+        ]
+        if not_found:
+            raise serializers.ValidationError(
+                RECIPES_ERROR_MESSAGES['ingredients_not_found'].format(
+                    ', '.join(not_found)
+                )
+            )
+        data['ingredients'] = {
+            ingredients_by_id[ingredient['id']]: ingredient['amount']
+            for ingredient in ingredients
+        }
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
         author = self.context['request'].user
         recipe = Recipe.objects.create(author=author, **validated_data)
-        recipe.save()
+        validated_data['image'].close()
         recipe.tags.set(tags_data)
-        recipe_ingredients = [
+        RecipeIngredients.objects.bulk_create(
             RecipeIngredients(
                 recipe=recipe,
-                ingredients=Ingredients.objects.get(id=ingredient['id']),
-                amount=ingredient['amount']
+                ingredients=ingredient,
+                amount=amount
             )
-            for ingredient in ingredients_data
-        ]
-        RecipeIngredients.objects.bulk_create(recipe_ingredients)
+            for ingredient, amount in ingredients_data.items()
+        )
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
@@ -180,65 +278,52 @@ class CreateOrUpdateRecipeSerializer(serializers.ModelSerializer):
         instance.name = validated_data.pop('name')
         instance.text = validated_data.pop('text')
         instance.cooking_time = validated_data.pop('cooking_time')
-        if validated_data.get('image') is not None:
-            instance.image = validated_data.pop('image')
+        image = validated_data.pop('image', None)
+        if image is not None:
+            instance.image = image
         instance.save()
+        if image is not None:
+            image.close()
         instance.tags.set(tags_data)
-        RecipeIngredients.objects.filter(recipe=instance).delete()
-        recipe_ingredients = [
+        amounts = {
+            ingredient.id: amount
+            for ingredient, amount in ingredients_data.items()
+        }
+        existing = {
+            recipe_ingredient.ingredients_id: recipe_ingredient
+            for recipe_ingredient
+            in RecipeIngredients.objects.filter(recipe=instance)
+        }
+        changed = []
+        for ingredient_id, recipe_ingredient in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        RecipeIngredients.objects.bulk_update(changed, ['amount'])
+        removed = existing.keys() - amounts.keys()
+        if removed:
+            RecipeIngredients.objects.filter(
+                recipe=instance,
+                ingredients_id__in=removed
+            ).delete()
+        RecipeIngredients.objects.bulk_create(
             RecipeIngredients(
                 recipe=instance,
-                ingredients=Ingredients.objects.get(id=ingredient['id']),
-                amount=ingredient['amount']
+                ingredients=ingredient,
+                amount=amount
             )
-            for ingredient in ingredients_data
-        ]
-        RecipeIngredients.objects.bulk_create(recipe_ingredients)
+            for ingredient, amount in ingredients_data.items()
+            if ingredient.id not in existing
+        )
         return instance
 
     def to_representation(self, instance):
+        instance = Recipe.objects.with_related().with_user_flags(
+            self.context['request'].user
+        ).get(pk=instance.pk)
         serializer = RecipeSerializer(
             instance,
             context=self.context
         )
         return serializer.data
-
-
-class FavoriteSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        fields = ('__all__')
-        model = Favorite
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Favorite.objects.all(),
-                fields=['favorite_user', 'favorite_recipe']
-            )
-        ]
-
-    def to_representation(self, instance):
-        serializer = SmallRecipeSerializer(
-            instance.favorite_recipe,
-            context=self.context
-        )
-        return serializer.data
-
-
-class ShoppingCartSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        fields = ('__all__')
-        model = ShoppingCart
-        validators = [
-            UniqueTogetherValidator(
-                queryset=ShoppingCart.objects.all(),
-                fields=['shopping_cart_user', 'shopping_cart_recipe']
-            )
-        ]
-
-    def to_representation(self, instance):
-        serializer = SmallRecipeSerializer(
-            instance.shopping_cart_recipe,
-            context=self.context
-        )
-        return serializer.data
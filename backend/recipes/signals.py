@@ -0,0 +1,247 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from users.models import CustomUser, Subscription
+from .caching import bump_version
+from .catalog import bump_catalog_version
+from .counters import recalculate_counters
+from .images import schedule_image_variants
+from .models import (Favorite, Ingredients, Recipe, RecipeIngredients,
+                     ShoppingCart, StoredFile, Tags)
+from .search import schedule_search_update
+
+SEARCH_FIELDS = {'name', 'text'}
+
+
+def change_counter(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    queryset.update(**{field: F(field) + delta})
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def ingredients_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_catalog_version('ingredients'))
+
+
+@receiver(post_save, sender=Tags)
+@receiver(post_delete, sender=Tags)
+def tags_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_catalog_version('tags'))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    recipe_id = instance.id
+    transaction.on_commit(lambda: bump_version(f'recipe:{recipe_id}'))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image:
+        return
+    if instance.image_variants.get('source') != instance.image.name:
+        schedule_image_variants(instance)
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_files_before_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None
+    if instance.pk is not None and not instance._state.adding:
+        previous = Recipe.objects.filter(pk=instance.pk).only(
+            'image',
+            'image_variants'
+        ).first()
+    instance._previous_stored_files = (
+        previous.stored_files() if previous is not None else set()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_files_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    StoredFile.objects.change_references(
+        instance.__dict__.pop('_previous_stored_files', set()),
+        instance.stored_files()
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_files_deleted(sender, instance, **kwargs):
+    StoredFile.objects.change_references(instance.stored_files(), set())
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        schedule_search_update([instance.id])
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_search_deleted(sender, instance, **kwargs):
+    schedule_search_update([instance.id])
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredients_search_changed(sender, instance, **kwargs):
+    schedule_search_update([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredients)
+def ingredients_search_changed(sender, instance, created, **kwargs):
+    if not created:
+        schedule_search_update(
+            RecipeIngredients.objects.filter(
+                ingredients=instance
+            ).values_list('recipe_id', flat=True).distinct()
+        )
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    recipe_id = instance.recipe_id
+    transaction.on_commit(lambda: bump_version(f'recipe:{recipe_id}'))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse and pk_set is None:
+        transaction.on_commit(lambda: bump_catalog_version('tags'))
+        return
+    recipe_ids = pk_set if reverse else [instance.id]
+
+    def bump_recipes():
+        for recipe_id in recipe_ids:
+            bump_version(f'recipe:{recipe_id}')
+    transaction.on_commit(bump_recipes)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def author_changed(sender, instance, **kwargs):
+    user_id = instance.id
+    transaction.on_commit(lambda: bump_version(f'user:{user_id}'))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(
+            CustomUser.objects.filter(pk=instance.author_id),
+            'recipes_count',
+            1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(
+        CustomUser.objects.filter(pk=instance.author_id),
+        'recipes_count',
+        -1
+    )
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(
+            Recipe.objects.filter(pk=instance.favorite_recipe_id),
+            'favorites_count',
+            1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.favorite_recipe_id),
+        'favorites_count',
+        -1
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(
+            Recipe.objects.filter(pk=instance.shopping_cart_recipe_id),
+            'shopping_carts_count',
+            1
+        )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    change_counter(
+        Recipe.objects.filter(pk=instance.shopping_cart_recipe_id),
+        'shopping_carts_count',
+        -1
+    )
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(
+            CustomUser.objects.filter(pk=instance.author_id),
+            'followers_count',
+            1
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    change_counter(
+        CustomUser.objects.filter(pk=instance.author_id),
+        'followers_count',
+        -1
+    )
+
+
+# loaddata сохраняет строки как есть (raw), и счётчики из фикстуры не
+# совпадают с базой. Счётчики - производные данные, поэтому после raw-записи
+# пересчитываем их для затронутых строк.
+@receiver(post_save, sender=Recipe)
+def recipe_loaded(sender, instance, raw=False, **kwargs):
+    if raw:
+        recalculate_counters(
+            recipe_ids=[instance.pk],
+            user_ids=[instance.author_id]
+        )
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_loaded(sender, instance, raw=False, **kwargs):
+    if raw:
+        recalculate_counters(recipe_ids=[instance.favorite_recipe_id])
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_loaded(sender, instance, raw=False, **kwargs):
+    if raw:
+        recalculate_counters(recipe_ids=[instance.shopping_cart_recipe_id])
+
+
+@receiver(post_save, sender=CustomUser)
+def user_loaded(sender, instance, raw=False, **kwargs):
+    if raw:
+        recalculate_counters(user_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_loaded(sender, instance, raw=False, **kwargs):
+    if raw:
+        recalculate_counters(user_ids=[instance.author_id])
@@ -0,0 +1,56 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+UPLOAD_PREFIX = '.upload-'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    # Имя файла - sha256 содержимого, разложенный по подкаталогам
+    # recipes/ab/cd/abcd....png, поэтому одинаковые картинки хранятся один раз.
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=full_directory,
+            prefix=UPLOAD_PREFIX
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as temp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory,
+                hexdigest[:2],
+                hexdigest[2:4],
+                hexdigest + extension
+            )
+            full_path = self.path(name)
+            try:
+                # Свежая отметка времени защищает файл от сборщика мусора,
+                # пока ссылка на него ещё не сохранена в базе. Если сборщик
+                # успел убрать файл, записываем его заново.
+                os.utime(full_path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(temp_path, self.file_permissions_mode)
+                os.replace(temp_path, full_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
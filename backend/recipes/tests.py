@@ -0,0 +1,821 @@
+import base64
+import io
+import os
+import re
+import struct
+import tempfile
+import time
+import unittest
+import zlib
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core import serializers
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from users.models import CustomUser, Subscription
+from .autocomplete import AUTOCOMPLETE_MAX_LIMIT, IngredientsTrie
+from . import fields
+from .exporters import pdf_text
+from .management.commands import collect_media_garbage
+from .search import update_search_documents
+from .fonts import (EMBEDDED_TABLES, glyph_components, glyph_data, load_font,
+                    subset_font, table_checksum)
+from .models import (Favorite, Ingredients, Recipe, RecipeIngredients,
+                     ShoppingCart, StoredFile, Tags)
+
+FEED_URL = '/api/recipes/'
+
+
+class RecipeFeedQueriesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            email='author@test.ru',
+            username='author',
+            password='pass12345!',
+            first_name='Автор',
+            last_name='Рецептов'
+        )
+        cls.reader = CustomUser.objects.create_user(
+            email='reader@test.ru',
+            username='reader',
+            password='pass12345!',
+            first_name='Читатель',
+            last_name='Рецептов'
+        )
+        tags = [
+            Tags.objects.create(name=f'Тэг {i}', color='#000000', slug=f't{i}')
+            for i in range(3)
+        ]
+        ingredients = [
+            Ingredients.objects.create(name=f'Ингредиент {i}',
+                                       measurement_unit='г')
+            for i in range(4)
+        ]
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.author,
+                name=f'Рецепт {i}',
+                text='Описание',
+                cooking_time=10
+            )
+            recipe.tags.set(tags[:i % 3 + 1])
+            RecipeIngredients.objects.bulk_create([
+                RecipeIngredients(
+                    recipe=recipe,
+                    ingredients=ingredient,
+                    amount=i + 1
+                )
+                for ingredient in ingredients[:i % 4 + 1]
+            ])
+            if i % 2:
+                Favorite.objects.create(
+                    favorite_user=cls.reader,
+                    favorite_recipe=recipe
+                )
+            if i % 3 == 0:
+                ShoppingCart.objects.create(
+                    shopping_cart_user=cls.reader,
+                    shopping_cart_recipe=recipe
+                )
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+
+    def assert_feed_queries(self, client, number):
+        # Число запросов не должно зависеть от размера страницы.
+        for limit in (3, 12):
+            # Готовые представления из кэша сократили бы число запросов.
+            cache.clear()
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(number):
+                    response = client.get(FEED_URL, {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), limit)
+
+    def test_anonymous_feed_queries(self):
+        # count, страница рецептов с авторами, тэги, ингредиенты.
+        self.assert_feed_queries(APIClient(), 4)
+
+    def test_authenticated_feed_queries(self):
+        # Флаги избранного, списка покупок и подписки считаются
+        # подзапросами в том же запросе, что и страница.
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        self.assert_feed_queries(client, 4)
+
+    def test_authenticated_feed_flags(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        results = client.get(FEED_URL, {'limit': 12}).json()['results']
+        favorited = {
+            recipe['name'] for recipe in results if recipe['is_favorited']
+        }
+        self.assertEqual(
+            favorited,
+            {f'Рецепт {i}' for i in range(12) if i % 2}
+        )
+        self.assertTrue(all(
+            recipe['author']['is_subscribed'] for recipe in results
+        ))
+
+    def test_cursor_pagination_rejects_search(self):
+        response = APIClient().get(
+            FEED_URL,
+            {'pagination': 'cursor', 'search': 'Рецепт'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+
+
+class CounterFieldsSaveTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            email='author@test.ru',
+            username='author',
+            password='pass12345!',
+            first_name='Автор',
+            last_name='Рецептов'
+        )
+
+    def test_user_save_keeps_recipes_count(self):
+        # request.user прочитан до того, как сигнал увеличил счётчик.
+        user = CustomUser.objects.get(id=self.author.id)
+        Recipe.objects.create(
+            author=self.author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(
+            '/api/users/set_password/',
+            {'current_password': 'pass12345!', 'new_password': 'New12345!x'}
+        )
+        self.assertEqual(response.status_code, 204)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+        self.assertTrue(self.author.check_password('New12345!x'))
+
+    def test_recipe_save_keeps_favorites_count(self):
+        recipe = Recipe.objects.create(
+            author=self.author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10
+        )
+        Favorite.objects.create(
+            favorite_user=self.author,
+            favorite_recipe=recipe
+        )
+        recipe.name = 'Новое название'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favorites_count, 1)
+
+    def test_loaddata_recalculates_counters(self):
+        recipe = Recipe.objects.create(
+            author=self.author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10
+        )
+        reader = CustomUser.objects.create_user(
+            email='reader@test.ru',
+            username='reader',
+            password='pass12345!',
+            first_name='Читатель',
+            last_name='Рецептов'
+        )
+        Subscription.objects.create(user=reader, author=self.author)
+        favorite = Favorite(favorite_user=reader, favorite_recipe=recipe)
+        # Фикстура со старыми счётчиками и избранным, которого ещё нет.
+        self.author.refresh_from_db()
+        self.author.recipes_count = self.author.followers_count = 0
+        recipe.refresh_from_db()
+        recipe.favorites_count = 5
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'fixture.json')
+            with open(path, 'w') as output:
+                serializers.serialize(
+                    'json',
+                    [self.author, recipe, favorite],
+                    stream=output
+                )
+            call_command('loaddata', path, verbosity=0)
+        self.author.refresh_from_db()
+        recipe.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertEqual(recipe.favorites_count, 1)
+
+
+class ShoppingCartPdfTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email='buyer@test.ru',
+            username='buyer',
+            password='pass12345!',
+            first_name='Покупатель',
+            last_name='Продуктов'
+        )
+        recipe = Recipe.objects.create(
+            author=cls.user,
+            name='Щи',
+            text='Описание',
+            cooking_time=10
+        )
+        RecipeIngredients.objects.create(
+            recipe=recipe,
+            ingredients=Ingredients.objects.create(
+                name='Ёжевика',
+                measurement_unit='г'
+            ),
+            amount=5
+        )
+        ShoppingCart.objects.create(
+            shopping_cart_user=cls.user,
+            shopping_cart_recipe=recipe
+        )
+
+    def download_pdf(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.get(
+            '/api/recipes/download_shopping_cart/',
+            {'type': 'pdf'}
+        )
+
+    @unittest.skipUnless(
+        os.path.exists(settings.PDF_FONT_PATH),
+        'Нет шрифта для PDF.'
+    )
+    def test_pdf_embeds_cyrillic_font(self):
+        response = self.download_pdf()
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content)
+        self.assertIn(b'/Encoding /Identity-H', content)
+        self.assertIn(b'/FontFile2', content)
+        self.assertNotIn(b'/Helvetica', content)
+        streams = re.findall(rb'stream\n(.*?)\nendstream', content, re.S)
+        # ToUnicode связывает глифы с буквами, по нему текст копируется.
+        self.assertTrue(any(
+            f'<{ord("Ё"):04X}>'.encode() in stream for stream in streams
+        ))
+        font_file = zlib.decompress(streams[-2])
+        self.assertTrue(font_file.startswith(b'\0\1\0\0'))
+
+    def test_missing_font_is_reported_before_streaming(self):
+        with tempfile.TemporaryDirectory() as directory:
+            broken_path = os.path.join(directory, 'broken.ttf')
+            with open(broken_path, 'wb') as output:
+                output.write(b'not a font')
+            for path in (os.path.join(directory, 'missing.ttf'), broken_path):
+                with self.subTest(path=path), self.settings(
+                    PDF_FONT_PATH=path
+                ):
+                    response = self.download_pdf()
+                    self.assertEqual(response.status_code, 503)
+                    self.assertFalse(response.streaming)
+                    self.assertIn('type', response.json())
+
+
+class ReleaseFixturesTest(TestCase):
+
+    def release(self):
+        call_command('release', skip_static=True, stdout=io.StringIO())
+
+    def test_release_keeps_existing_rows(self):
+        self.release()
+        admin = CustomUser.objects.get(email='ad@ad.ru')
+        Recipe.objects.create(
+            author=admin,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10
+        )
+        admin.set_password('New12345!x')
+        admin.save()
+        Tags.objects.filter(slug='breakfast').update(name='Бранч')
+        self.release()
+        admin.refresh_from_db()
+        self.assertEqual(admin.recipes_count, 1)
+        self.assertTrue(admin.check_password('New12345!x'))
+        self.assertEqual(Tags.objects.get(slug='breakfast').name, 'Бранч')
+        self.assertEqual(Tags.objects.count(), 3)
+
+
+def read_font_tables(data):
+    count = struct.unpack_from('>H', data, 4)[0]
+    tables = {}
+    for index in range(count):
+        tag, checksum, offset, length = struct.unpack_from(
+            '>4sIII', data, 12 + index * 16
+        )
+        tables[tag] = (checksum, data[offset:offset + length])
+    return tables
+
+
+@unittest.skipUnless(
+    os.path.exists(settings.PDF_FONT_PATH),
+    'Нет шрифта для PDF.'
+)
+class TrueTypeSubsetTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.font = load_font(settings.PDF_FONT_PATH)
+
+    def glyph(self, char):
+        return self.font['cmap'][ord(char)]
+
+    def subset_glyphs(self, glyphs):
+        tables = read_font_tables(subset_font(self.font, glyphs))
+        self.assertEqual(
+            set(tables),
+            {tag for tag in EMBEDDED_TABLES if tag in self.font['tables']}
+        )
+        for tag, (checksum, table) in tables.items():
+            self.assertEqual(checksum, table_checksum(table), tag)
+        head = tables[b'head'][1]
+        self.assertEqual(struct.unpack_from('>h', head, 50)[0], 1)
+        count = len(self.font['widths'])
+        loca = struct.unpack_from(f'>{count + 1}I', tables[b'loca'][1])
+        glyf = tables[b'glyf'][1]
+        return {
+            glyph: glyf[loca[glyph]:loca[glyph + 1]]
+            for glyph in range(count)
+            if loca[glyph + 1] > loca[glyph]
+        }
+
+    def test_subset_round_trip(self):
+        used = {self.glyph('Ж'), self.glyph('a')}
+        glyphs = self.subset_glyphs(used)
+        self.assertEqual(set(glyphs), used | {0})
+        for glyph, data in glyphs.items():
+            original = glyph_data(self.font, glyph)
+            self.assertEqual(data[:len(original)], original)
+            self.assertFalse(data[len(original):].strip(b'\0'))
+        self.assertNotIn(self.glyph('b'), glyphs)
+
+    def test_subset_keeps_composite_components(self):
+        # Ё собрана из Е и диерезиса, а Е в DejaVu - сама составная из E.
+        composite = self.glyph('Ё')
+        components = set(glyph_components(self.font, composite))
+        self.assertEqual(len(components), 2)
+        nested = {
+            glyph for component in components
+            for glyph in glyph_components(self.font, component)
+        }
+        self.assertTrue(nested)
+        glyphs = self.subset_glyphs({composite})
+        self.assertEqual(set(glyphs), components | nested | {composite, 0})
+
+    def test_missing_characters_use_notdef(self):
+        self.assertNotIn(0xe000, self.font['cmap'])
+        used = {}
+        text = pdf_text(self.font, used, 'Ж\ue000Ж')
+        self.assertEqual(
+            text,
+            b'%04X0000%04X' % (self.glyph('Ж'), self.glyph('Ж'))
+        )
+        self.assertEqual(used, {self.glyph('Ж'): 'Ж'})
+        self.assertEqual(set(self.subset_glyphs(used)), {0, self.glyph('Ж')})
+
+
+class CollectMediaGarbageTest(TestCase):
+    content = b'picture'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media = override_settings(MEDIA_ROOT=directory.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def stored_file(self, references, age_minutes):
+        name = self.storage.save(
+            'recipes/image.png',
+            ContentFile(self.content)
+        )
+        modified = timezone.now() - timedelta(minutes=age_minutes)
+        os.utime(self.storage.path(name), (time.time(), modified.timestamp()))
+        StoredFile.objects.create(name=name, references=references)
+        StoredFile.objects.filter(name=name).update(modified=modified)
+        return name
+
+    def collect(self):
+        call_command('collect_media_garbage', stdout=io.StringIO())
+
+    def assert_kept(self, name, references):
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(
+            StoredFile.objects.get(name=name).references,
+            references
+        )
+
+    def test_unreferenced_stale_file_is_deleted(self):
+        name = self.stored_file(references=0, age_minutes=120)
+        self.collect()
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_referenced_file_is_kept(self):
+        name = self.stored_file(references=1, age_minutes=120)
+        self.collect()
+        self.assert_kept(name, 1)
+
+    def test_file_within_grace_period_is_kept(self):
+        name = self.stored_file(references=0, age_minutes=10)
+        self.collect()
+        self.assert_kept(name, 0)
+
+    def test_reference_recreated_before_lock(self):
+        name = self.stored_file(references=0, age_minutes=120)
+        select_for_update = StoredFile.objects.select_for_update
+
+        def reupload():
+            # Рецепт снова сослался на файл после выборки кандидатов.
+            StoredFile.objects.change_references(set(), {name})
+            return select_for_update()
+
+        with mock.patch.object(
+            StoredFile.objects,
+            'select_for_update',
+            side_effect=reupload
+        ):
+            self.collect()
+        self.assert_kept(name, 1)
+
+    def test_reupload_during_delete(self):
+        name = self.stored_file(references=0, age_minutes=120)
+        command_class = collect_media_garbage.Command
+        is_stale = command_class.is_stale
+        uploaded = []
+
+        def reupload(command, path):
+            try:
+                return is_stale(command, path)
+            finally:
+                if not uploaded:
+                    # Файл признан устаревшим, но до переименования его
+                    # загрузили снова: хранилище обновило отметку времени.
+                    uploaded.append(self.storage.save(
+                        'recipes/image.png',
+                        ContentFile(self.content)
+                    ))
+                    StoredFile.objects.change_references(set(), {name})
+
+        with mock.patch.object(command_class, 'is_stale', reupload):
+            self.collect()
+        self.assertEqual(uploaded, [name])
+        self.assert_kept(name, 1)
+
+
+class RecipeSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create_user(
+            email='author@test.ru',
+            username='author',
+            password='pass12345!',
+            first_name='Автор',
+            last_name='Рецептов'
+        )
+        tomato, basil, beet = (
+            Ingredients.objects.create(name=name, measurement_unit='г')
+            for name in ('Томат', 'Базилик', 'Свёкла')
+        )
+        recipes = [
+            ('Томатный суп', 'Сварить.', [basil]),
+            ('Паста', 'Сварить.', [tomato]),
+            ('Рагу', 'Потушить овощи и томаты.', []),
+            ('Борщ', 'Сварить со свеклой.', []),
+            ('Винегрет', 'Нарезать.', [beet]),
+            ('Компот', 'Сварить.', []),
+        ]
+        for name, text, ingredients in recipes:
+            recipe = Recipe.objects.create(
+                author=author,
+                name=name,
+                text=text,
+                cooking_time=10
+            )
+            RecipeIngredients.objects.bulk_create([
+                RecipeIngredients(
+                    recipe=recipe,
+                    ingredients=ingredient,
+                    amount=1
+                )
+                for ingredient in ingredients
+            ])
+        # Индекс обновляется после коммита, а TestCase его не делает.
+        update_search_documents(Recipe.objects.values_list('id', flat=True))
+
+    def setUp(self):
+        # Представления рецептов из кэша других тестов с теми же id.
+        cache.clear()
+
+    def search(self, value):
+        response = APIClient().get(FEED_URL, {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['name'] for recipe in response.json()['results']]
+
+    def test_rank_prefers_name_then_ingredients_then_text(self):
+        self.assertEqual(
+            self.search('томат'),
+            ['Томатный суп', 'Паста', 'Рагу']
+        )
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('томатный базилик'), ['Томатный суп'])
+
+    @unittest.skipUnless(
+        connection.vendor == 'sqlite',
+        'Проверяется запасной поиск через FTS5.'
+    )
+    def test_sqlite_tokens_prefixes_and_yo(self):
+        # Пунктуация и кавычки не попадают в синтаксис MATCH.
+        self.assertEqual(self.search('"томатн", суп!'), ['Томатный суп'])
+        self.assertEqual(
+            self.search('тома'),
+            ['Томатный суп', 'Паста', 'Рагу']
+        )
+        self.assertEqual(
+            set(self.search('свекл')),
+            {'Борщ', 'Винегрет'}
+        )
+        self.assertEqual(
+            set(self.search('свёкл')),
+            {'Борщ', 'Винегрет'}
+        )
+        self.assertEqual(self.search('...'), [
+            'Компот', 'Винегрет', 'Борщ', 'Рагу', 'Паста', 'Томатный суп'
+        ])
+
+
+class RecipeIngredientsUpdateTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(
+            email='author@test.ru',
+            username='author',
+            password='pass12345!',
+            first_name='Автор',
+            last_name='Рецептов'
+        )
+        cls.tag = Tags.objects.create(name='Обед', color='#000000', slug='t')
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name=f'Ингредиент {i}',
+                measurement_unit='г'
+            )
+            for i in range(4)
+        ]
+        cls.recipe = Recipe.objects.create(
+            author=cls.author,
+            name='Рецепт',
+            text='Описание',
+            cooking_time=10
+        )
+        cls.recipe.tags.set([cls.tag])
+        RecipeIngredients.objects.bulk_create([
+            RecipeIngredients(
+                recipe=cls.recipe,
+                ingredients=ingredient,
+                amount=amount
+            )
+            for ingredient, amount in zip(cls.ingredients[:3], (1, 2, 3))
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def rows(self):
+        return {
+            ingredients_id: (row_id, amount)
+            for row_id, ingredients_id, amount
+            in RecipeIngredients.objects.filter(
+                recipe=self.recipe
+            ).values_list('id', 'ingredients_id', 'amount')
+        }
+
+    def test_patch_diffs_ingredients(self):
+        first, second, third, fourth = (
+            ingredient.id for ingredient in self.ingredients
+        )
+        before = self.rows()
+        client = APIClient()
+        client.force_authenticate(self.author)
+        # Рецепт с тэгами и ингредиентами (3), тэги и ингредиенты из
+        # запроса (2), точка сохранения (2), старые файлы и сохранение
+        # рецепта (2), тэги (1), разница ингредиентов: выборка, bulk_update,
+        # выборка и удаление, bulk_create (5), ответ (3).
+        with self.assertNumQueries(18):
+            response = client.patch(
+                f'{FEED_URL}{self.recipe.id}/',
+                {
+                    'name': 'Рецепт',
+                    'text': 'Описание',
+                    'cooking_time': 10,
+                    'tags': [self.tag.id],
+                    'ingredients': [
+                        {'id': first, 'amount': 10},
+                        {'id': second, 'amount': 2},
+                        {'id': fourth, 'amount': 4},
+                    ]
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        after = self.rows()
+        self.assertEqual(
+            {ingredient: amount for ingredient, (_, amount) in after.items()},
+            {first: 10, second: 2, fourth: 4}
+        )
+        # Изменённая и нетронутая строки обновлены на месте.
+        self.assertEqual(after[first][0], before[first][0])
+        self.assertEqual(after[second][0], before[second][0])
+        self.assertNotIn(third, after)
+
+
+class CatalogETagTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = Tags.objects.create(name='Обед', color='#000000', slug='t')
+        cls.ingredient = Ingredients.objects.create(
+            name='Соль',
+            measurement_unit='г'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def assert_not_modified(self, url, etag):
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def assert_etag_changes(self, url, edit, new_name):
+        etag = self.client.get(url)['ETag']
+        self.assert_not_modified(url, etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            edit()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(new_name, [item['name'] for item in response.json()])
+        self.assert_not_modified(url, response['ETag'])
+
+    def test_tag_edit_changes_etag(self):
+        ingredients_etag = self.client.get('/api/ingredients/')['ETag']
+
+        def rename():
+            self.tag.name = 'Ужин'
+            self.tag.save()
+
+        self.assert_etag_changes('/api/tags/', rename, 'Ужин')
+        # Каталог ингредиентов от правки тэга не устаревает.
+        self.assert_not_modified('/api/ingredients/', ingredients_etag)
+
+    def test_ingredient_edit_changes_etag(self):
+        def rename():
+            self.ingredient.name = 'Перец'
+            self.ingredient.save()
+
+        self.assert_etag_changes('/api/ingredients/', rename, 'Перец')
+
+
+class IngredientsTrieTest(unittest.TestCase):
+    names = ('соль', 'Солод', 'Сахар', 'соль морская', 'Соевый соус')
+
+    def setUp(self):
+        self.ingredients = [
+            {'id': index, 'name': name, 'measurement_unit': 'г'}
+            for index, name in enumerate(self.names, start=1)
+        ]
+
+    def search(self, prefix, **kwargs):
+        trie = IngredientsTrie(self.ingredients, **kwargs)
+        return [ingredient['name'] for ingredient in trie.search(prefix)]
+
+    def test_prefix_match_in_name_order(self):
+        self.assertEqual(
+            self.search('со'),
+            ['Соевый соус', 'Солод', 'соль', 'соль морская']
+        )
+        self.assertEqual(self.search('соль '), ['соль морская'])
+        self.assertEqual(self.search('мор'), [])
+
+    def test_case_insensitive(self):
+        self.assertEqual(self.search('СОЛ'), self.search('сол'))
+        self.assertEqual(self.search('САХ'), ['Сахар'])
+
+    def test_limit(self):
+        trie = IngredientsTrie(self.ingredients)
+        self.assertEqual(len(trie.search('', limit=2)), 2)
+        # Узел хранит только max_limit первых ингредиентов поддерева.
+        self.assertEqual(
+            [
+                ingredient['name']
+                for ingredient in IngredientsTrie(
+                    self.ingredients,
+                    max_limit=2
+                ).search('с', limit=10)
+            ],
+            ['Сахар', 'Соевый соус']
+        )
+
+
+class IngredientsAutocompleteTest(TestCase):
+    url = '/api/ingredients/autocomplete/'
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredients.objects.bulk_create([
+            Ingredients(name=f'Соль {index:03}', measurement_unit='г')
+            for index in range(AUTOCOMPLETE_MAX_LIMIT + 5)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def autocomplete(self, **params):
+        response = APIClient().get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def test_limit(self):
+        self.assertEqual(len(self.autocomplete(name='соль')), 20)
+        self.assertEqual(
+            self.autocomplete(name='СОЛЬ', limit=2),
+            ['Соль 000', 'Соль 001']
+        )
+        self.assertEqual(
+            len(self.autocomplete(name='соль', limit=1000)),
+            AUTOCOMPLETE_MAX_LIMIT
+        )
+
+    def test_rebuild_after_ingredient_change(self):
+        self.assertEqual(self.autocomplete(name='перец'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredients.objects.create(name='Перец', measurement_unit='г')
+        self.assertEqual(self.autocomplete(name='пер'), ['Перец'])
+        ingredient = Ingredients.objects.get(name='Соль 000')
+        ingredient.name = 'Перец душистый'
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.save()
+        self.assertEqual(
+            self.autocomplete(name='перец'),
+            ['Перец', 'Перец душистый']
+        )
+        self.assertEqual(self.autocomplete(name='соль', limit=1), ['Соль 001'])
+
+
+class RecipeImageFieldTest(SimpleTestCase):
+
+    def setUp(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (4, 4), 'red').save(buffer, 'PNG')
+        self.encoded = base64.b64encode(buffer.getvalue()).decode()
+
+    def test_base64_with_line_breaks(self):
+        # Перенос по 76 символов, как в MIME, ломает кратность кускам по 4.
+        wrapped = '\r\n'.join(
+            self.encoded[start:start + 76]
+            for start in range(0, len(self.encoded), 76)
+        )
+        field = fields.RecipeImageField()
+        with mock.patch.object(fields, 'BASE64_CHUNK_SIZE', 8):
+            image = field.to_internal_value(
+                f'data:image/png;base64, {wrapped}\n'
+            )
+        self.assertEqual(image.content_type, 'image/png')
+        self.assertEqual(image.read(), base64.b64decode(self.encoded))
+
+    def test_invalid_characters_are_rejected(self):
+        field = fields.RecipeImageField()
+        with self.assertRaises(ValidationError):
+            field.to_internal_value(self.encoded[:-4] + '!!!!')
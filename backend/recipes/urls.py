@@ -1,6 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api_foodgram.async_views import async_urls
+
 from .views import IngredientsViewSet, RecipeViewSet, TagsViewSet
 
 router_v1 = DefaultRouter()
@@ -22,5 +24,5 @@ router_v1.register(
 )
 
 urlpatterns = [
-    path('', include(router_v1.urls))
+    path('', include(async_urls(router_v1.urls)))
 ]
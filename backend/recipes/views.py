@@ -1,27 +1,27 @@
 from django.db.models import Sum
-from django.shortcuts import HttpResponse
+from django.http import Http404, StreamingHttpResponse
 
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from users.serializers import SmallRecipeSerializer
+from .autocomplete import (AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT,
+                           get_ingredients_trie)
+from .catalog import CatalogCacheMixin
+from .exporters import SHOPPING_CART_EXPORTERS, ExportUnavailableError
 from .filters import IngredientsFilter, RecipesFilter
 from .models import (Favorite, Ingredients, Recipe, RecipeIngredients,
                      ShoppingCart, Tags)
+from .pagination import RecipePagination
 from .permissions import IsAuthor
-from .serializers import (CreateOrUpdateRecipeSerializer, FavoriteSerializer,
+from .serializers import (CreateOrUpdateRecipeSerializer,
                           IngredientsSerializer, RecipeSerializer,
-                          ShoppingCartSerializer, TagsSerializer)
+                          TagsSerializer)
 
-SHOPPING_CART_MSG = 'Вот необходимые для приготовления блюд ингредиенты:'
-
-
-class CustomPageNumberPagination(PageNumberPagination):
-    page_size_query_param = 'limit'
-    max_page_size = 150
+SHOPPING_CART_EXPORT_CHUNK_SIZE = 500
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -39,12 +39,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
         'add_to_shopping_cart': [IsAuthenticated],
         'download_shopping_cart': [IsAuthenticated]
     }
-    pagination_class = CustomPageNumberPagination
+    replica_read_actions = ('list', 'retrieve', 'download_shopping_cart')
+    pagination_class = RecipePagination
     filterset_class = RecipesFilter
     filterset_fields = ['tags', 'is_favorite', 'is_in_shopping_cart']
     ordering = ('-pub_date',)
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
 
+    def get_queryset(self):
+        return Recipe.objects.with_related().with_user_flags(
+            self.request.user
+        )
+
     def get_serializer_class(self):
         if self.action in ('create', 'update', 'partial_update'):
             return CreateOrUpdateRecipeSerializer
@@ -64,39 +70,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path='favorite'
     )
     def favorite(self, request, id=None):
-        user = self.request.user
-        recipe = get_object_or_404(
-            Recipe,
-            id=id
-        )
-        if request.method == 'GET':
-            serializer = FavoriteSerializer(
-                data={
-                    'favorite_user': user.id,
-                    'favorite_recipe': recipe.id
-                },
-                context={
-                    'request': request
-                }
-            )
-            if serializer.is_valid():
-                serializer.save()
-                return Response(
-                    serializer.data,
-                    status=status.HTTP_201_CREATED
-                )
-            return Response(
-                serializer.errors,
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        favorite_recipe = get_object_or_404(
+        return self.change_relation(
             Favorite,
-            favorite_user=user,
-            favorite_recipe=recipe
-        )
-        favorite_recipe.delete()
-        return Response(
-            status=status.HTTP_204_NO_CONTENT
+            'favorite_user',
+            'favorite_recipe',
+            id
         )
 
     @action(
@@ -107,37 +85,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path='shopping_cart'
     )
     def add_to_shopping_cart(self, request, id=None):
-        user = self.request.user
-        recipe = get_object_or_404(
-            Recipe,
-            id=id
+        return self.change_relation(
+            ShoppingCart,
+            'shopping_cart_user',
+            'shopping_cart_recipe',
+            id
         )
-        if request.method == 'GET':
-            serializer = ShoppingCartSerializer(
-                data={
-                    'shopping_cart_user': user.id,
-                    'shopping_cart_recipe': recipe.id
-                },
+
+    def change_relation(self, model, user_field, recipe_field, id):
+        user = self.request.user
+        if self.request.method == 'GET':
+            recipe = get_object_or_404(
+                Recipe,
+                id=id
+            )
+            model.objects.add(**{user_field: user, recipe_field: recipe})
+            serializer = SmallRecipeSerializer(
+                recipe,
                 context={
-                    'request': request
+                    'request': self.request
                 }
             )
-            if serializer.is_valid():
-                serializer.save()
-                return Response(
-                    serializer.data,
-                    status=status.HTTP_201_CREATED
-                )
             return Response(
-                serializer.errors,
-                status=status.HTTP_400_BAD_REQUEST
+                serializer.data,
+                status=status.HTTP_201_CREATED
             )
-        shopping_cart_recipe = get_object_or_404(
-            ShoppingCart,
-            shopping_cart_user=user,
-            shopping_cart_recipe=recipe
-        )
-        shopping_cart_recipe.delete()
+        deleted, _ = model.objects.filter(
+            **{user_field: user, f'{recipe_field}_id': id}
+        ).delete()
+        if not deleted:
+            raise Http404
         return Response(
             status=status.HTTP_204_NO_CONTENT
         )
@@ -151,36 +128,50 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def download_shopping_cart(self, request):
         user = self.request.user
-        shopping_cart_recipes = ShoppingCart.objects.filter(
-            shopping_cart_user=user
-        )
-        shopping_cart = {}
-        for recipe in shopping_cart_recipes:
-            for ingredient in recipe.shopping_cart_recipe.ingredients.all():
-                amount = RecipeIngredients.objects.filter(
-                    ingredients=ingredient
-                ).aggregate(Sum('amount'))
-                shopping_cart[ingredient.name] = (
-                    str(amount['amount__sum']), ingredient.measurement_unit
-                )
-        shop_list = ';\n'.join(
-            [
-                ' - '.join(
-                    (ing, shopping_cart[ing][0] + shopping_cart[ing][1])
-                )
-                for ing in shopping_cart
-            ]
-        )
-        content = (
-            f'{user.username},\n{SHOPPING_CART_MSG}\n{shop_list}.'
+        file_type = request.query_params.get('type', 'txt')
+        if file_type not in SHOPPING_CART_EXPORTERS:
+            return Response(
+                {
+                    'type': [
+                        'Допустимые форматы: {0}.'.format(
+                            ', '.join(SHOPPING_CART_EXPORTERS)
+                        )
+                    ]
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        exporter, content_type = SHOPPING_CART_EXPORTERS[file_type]
+        shopping_cart = RecipeIngredients.objects.filter(
+            recipe__shopping_cart_recipe__shopping_cart_user=user
+        ).values(
+            'ingredients__name',
+            'ingredients__measurement_unit'
+        ).annotate(
+            total_amount=Sum('amount')
+        ).order_by(
+            'ingredients__name'
+        ).iterator(
+            chunk_size=SHOPPING_CART_EXPORT_CHUNK_SIZE
         )
-        response = HttpResponse(content, content_type='text/plain')
+        try:
+            content = exporter(user, shopping_cart)
+        except ExportUnavailableError as error:
+            return Response(
+                {'type': [str(error)]},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        response = StreamingHttpResponse(content, content_type=content_type)
         response['Content-Disposition'] = (
-            'attachment; filename={0}'.format('shopping_cart_list.txt'))
+            'attachment; filename={0}'.format(
+                f'shopping_cart_list.{file_type}'
+            )
+        )
         return response
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
+    catalog_name = 'ingredients'
+    replica_read_actions = ('list', 'retrieve', 'autocomplete')
     serializer_class = IngredientsSerializer
     queryset = Ingredients.objects.all()
     lookup_field = 'id'
@@ -189,8 +180,26 @@ class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ('id')
     pagination_class = None
 
+    @action(
+        detail=False,
+        methods=['get'],
+        name='autocomplete',
+        url_name='autocomplete',
+        url_path='autocomplete'
+    )
+    def autocomplete(self, request):
+        name = request.query_params.get('name', '')
+        limit = request.query_params.get('limit', '')
+        limit = (
+            min(int(limit), AUTOCOMPLETE_MAX_LIMIT) if limit.isdigit()
+            else AUTOCOMPLETE_LIMIT
+        )
+        return Response(get_ingredients_trie().search(name, limit))
+
 
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+class TagsViewSet(CatalogCacheMixin, viewsets.ReadOnlyModelViewSet):
+    catalog_name = 'tags'
+    replica_read_actions = ('list', 'retrieve')
     serializer_class = TagsSerializer
     queryset = Tags.objects.all()
     lookup_field = 'id'
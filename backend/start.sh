@@ -1,11 +1,7 @@
 #!/bin/sh
-python -m pip install --upgrade pip
-pip install -r requirements.txt
-
-python manage.py collectstatic --noinput
-python manage.py makemigrations recipes
-python manage.py makemigrations users
-python manage.py migrate
-python manage.py loaddata fixtures.json
-
-gunicorn api_foodgram.wsgi:application --bind 0.0.0.0
+# Миграции, статика и справочники готовятся один раз командой release.sh.
+if [ "$ASGI" = "1" ]; then
+    export GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+    exec gunicorn --config gunicorn.conf.py api_foodgram.asgi:application
+fi
+exec gunicorn --config gunicorn.conf.py api_foodgram.wsgi:application
@@ -0,0 +1,94 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+from api_foodgram.replicas import use_primary
+from recipes.caching import bump_version, get_versions
+
+TOKEN_CACHE_VERSION = 'auth:tokens'
+
+_tokens = OrderedDict()
+_tokens_lock = threading.Lock()
+# Версия в общем кэше нужна, чтобы выход или смена пароля в одном воркере
+# сбрасывали кэш токенов и в остальных.
+_version = (None, 0)
+
+
+def check_shared_version():
+    global _version
+    checked_at, version = _version
+    now = time.monotonic()
+    if (
+        checked_at is not None
+        and now - checked_at < settings.TOKEN_CACHE_CHECK_INTERVAL
+    ):
+        return
+    current = get_versions([TOKEN_CACHE_VERSION])[TOKEN_CACHE_VERSION]
+    with _tokens_lock:
+        if checked_at is not None and current != version:
+            _tokens.clear()
+        _version = (now, current)
+
+
+def get_cached_token(key):
+    check_shared_version()
+    with _tokens_lock:
+        cached = _tokens.get(key)
+        if cached is None:
+            return None
+        if cached[0] < time.monotonic():
+            del _tokens[key]
+            return None
+        _tokens.move_to_end(key)
+    return cached[1], cached[2]
+
+
+def cache_token(key, user, token):
+    with _tokens_lock:
+        _tokens[key] = (
+            time.monotonic() + settings.TOKEN_CACHE_TTL,
+            user,
+            token
+        )
+        _tokens.move_to_end(key)
+        while len(_tokens) > settings.TOKEN_CACHE_MAX_SIZE:
+            _tokens.popitem(last=False)
+
+
+def forget_tokens(user_id=None, key=None):
+    with _tokens_lock:
+        for cached_key, (_, user, _) in list(_tokens.items()):
+            if cached_key == key or user.id == user_id:
+                del _tokens[cached_key]
+    bump_version(TOKEN_CACHE_VERSION)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    use_cache = False
+
+    def authenticate(self, request):
+        # Изменяющие запросы получают пользователя из базы: view может
+        # сохранить его, и устаревшая копия затёрла бы чужие правки.
+        self.use_cache = (
+            settings.TOKEN_CACHE_ENABLED and request.method in SAFE_METHODS
+        )
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        if not self.use_cache:
+            return super().authenticate_credentials(key)
+        cached = get_cached_token(key)
+        if cached is None:
+            with use_primary():
+                user, token = super().authenticate_credentials(key)
+            cache_token(key, user, token)
+            return user, token
+        user, token = cached
+        # Каждому запросу своя копия, чтобы изменения пользователя во view
+        # не попадали в кэш.
+        return copy.copy(user), token
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def remove_duplicate_subscriptions(apps, schema_editor):
+    # Перед уникальным ограничением оставляем по одной подписке на пару.
+    Subscription = apps.get_model('users', 'Subscription')
+    duplicates = Subscription.objects.values('user', 'author').annotate(
+        first_id=models.Min('id'),
+        total=models.Count('id')
+    ).filter(total__gt=1)
+    for duplicate in duplicates:
+        Subscription.objects.filter(
+            user=duplicate['user'],
+            author=duplicate['author']
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_subscriptions,
+            migrations.RunPython.noop
+        ),
+    ]
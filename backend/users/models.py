@@ -1,8 +1,41 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
 
-class CustomUser(AbstractUser):
+class RelationQuerySet(models.QuerySet):
+
+    def add(self, **fields):
+        try:
+            with transaction.atomic():
+                return self.create(**fields), True
+        except IntegrityError:
+            return None, False
+
+
+class CountersModelMixin:
+    # Счётчики меняются только через F() в сигналах. Полное сохранение
+    # прочитанного раньше экземпляра затёрло бы их, поэтому save() без
+    # update_fields пишет все поля, кроме счётчиков.
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class CustomUser(CountersModelMixin, AbstractUser):
     first_name = models.CharField(
         max_length=150,
         verbose_name='Имя',
@@ -21,9 +54,20 @@ class CustomUser(AbstractUser):
         help_text='Адрес вашей эл.почты',
         unique=True
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Число рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0,
+        editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    counter_fields = ('recipes_count', 'followers_count')
 
     def __str__(self):
         return self.email
@@ -49,9 +93,17 @@ class Subscription(models.Model):
         null=True
     )
 
+    objects = RelationQuerySet.as_manager()
+
     def __str__(self):
         return ('Подписки')
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_subscription'
+            )
+        ]
         verbose_name = 'Подписки'
         verbose_name_plural = 'Подписки'
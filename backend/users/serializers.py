@@ -1,6 +1,6 @@
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
+from recipes.fields import ImageVariantsField
 from recipes.models import Recipe
 from .models import CustomUser, Subscription
 
@@ -28,6 +28,9 @@ class UsersSerializer(serializers.ModelSerializer):
         model = CustomUser
 
     def get_is_subscribed(self, instance):
+        is_subscribed = getattr(instance, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         user = self.context['request'].user
         if user.is_authenticated:
             return Subscription.objects.filter(
@@ -38,11 +41,14 @@ class UsersSerializer(serializers.ModelSerializer):
 
 
 class SmallRecipeSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
     class Meta:
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time'
         )
         model = Recipe
@@ -66,6 +72,12 @@ class RecipeAuthorSerializer(UsersSerializer):
         model = CustomUser
 
     def get_recipes(self, instance):
+        if 'recipes' in self.context:
+            serializer = SmallRecipeSerializer(
+                self.context['recipes'].get(instance.id, []),
+                many=True
+            )
+            return serializer.data
         recipes_limit = self.context['request'].query_params.get(
             'recipes_limit'
         )
@@ -85,31 +97,4 @@ class RecipeAuthorSerializer(UsersSerializer):
         return serializer.data
 
     def get_recipes_count(self, instanse):
-        return Recipe.objects.filter(author=instanse).count()
-
-
-class SubscriptionsSerializer(serializers.ModelSerializer):
-
-    class Meta:
-        fields = ('__all__')
-        model = Subscription
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Subscription.objects.all(),
-                fields=['user', 'author']
-            )
-        ]
-
-    def validate(self, data):
-        if self.context['request'].user != data.get('author'):
-            return data
-        raise serializers.ValidationError(
-            USERS_ERROR_MESSAGES['subscribe_to_yourself']
-        )
-
-    def to_representation(self, instance):
-        serializer = RecipeAuthorSerializer(
-            instance.author,
-            context=self.context
-        )
-        return serializer.data
+        return instanse.recipes_count
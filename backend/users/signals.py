@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_tokens
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Смена пароля, блокировка и правка профиля меняют закэшированного
+    # пользователя, а отметка о входе - нет.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    user_id = instance.id
+    transaction.on_commit(lambda: forget_tokens(user_id=user_id))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: forget_tokens(key=key))
@@ -0,0 +1,82 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.caching import bump_version
+from . import authentication
+from .models import CustomUser
+
+ME_URL = '/api/users/me/'
+
+
+@override_settings(TOKEN_CACHE_ENABLED=True, TOKEN_CACHE_CHECK_INTERVAL=0)
+class CachedTokenAuthenticationTest(TestCase):
+
+    def setUp(self):
+        authentication._tokens.clear()
+        authentication._version = (None, 0)
+        self.user = CustomUser.objects.create_user(
+            email='user@test.ru',
+            username='user',
+            password='pass12345!',
+            first_name='Имя',
+            last_name='Фамилия'
+        )
+        self.key = APIClient().post(
+            '/api/auth/token/login/',
+            {'email': 'user@test.ru', 'password': 'pass12345!'}
+        ).json()['auth_token']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.key}')
+        # Первый запрос кладёт токен в кэш воркера.
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        self.assertIn(self.key, authentication._tokens)
+
+    def tearDown(self):
+        authentication._tokens.clear()
+        authentication._version = (None, 0)
+
+    def assert_token_rejected(self):
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    def test_cached_token_is_used(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if Token._meta.db_table in query['sql']
+        ])
+
+    def test_logout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_token_rejected()
+
+    def test_password_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/users/set_password/',
+                {
+                    'current_password': 'pass12345!',
+                    'new_password': 'New12345!x'
+                }
+            )
+        self.assertEqual(response.status_code, 204)
+        self.assert_token_rejected()
+
+    def test_deactivated_user(self):
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assert_token_rejected()
+
+    def test_token_deleted_in_another_process(self):
+        # Другой воркер удалил токен: в этом процессе сигнал не пришёл,
+        # остаётся только версия в общем кэше.
+        Token.objects.filter(key=self.key)._raw_delete('default')
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        bump_version(authentication.TOKEN_CACHE_VERSION)
+        self.assert_token_rejected()
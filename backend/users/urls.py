@@ -1,6 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api_foodgram.async_views import async_urls
+
 from .views import UsersViewSet
 
 router_v1 = DefaultRouter()
@@ -12,6 +14,6 @@ router_v1.register(
 )
 
 urlpatterns = [
-    path('', include(router_v1.urls)),
+    path('', include(async_urls(router_v1.urls))),
     path('auth/', include('djoser.urls.authtoken'))
 ]
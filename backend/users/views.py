@@ -1,3 +1,5 @@
+from django.db.models import Exists, OuterRef
+from django.http import Http404
 from djoser.views import UserViewSet
 
 from rest_framework import status
@@ -6,13 +8,29 @@ from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from recipes.views import CustomPageNumberPagination
+from recipes.models import Recipe
+from recipes.pagination import SubscriptionsPagination
 from .models import CustomUser, Subscription
-from .serializers import SubscriptionsSerializer
+from .serializers import USERS_ERROR_MESSAGES, RecipeAuthorSerializer
 
 
 class UsersViewSet(UserViewSet):
-    pagination_class = CustomPageNumberPagination
+    pagination_class = SubscriptionsPagination
+    replica_read_actions = ('list', 'retrieve', 'subscriptions')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated and self.action in ('list', 'retrieve'):
+            return queryset.annotate(
+                is_subscribed=Exists(
+                    Subscription.objects.filter(
+                        user=user,
+                        author=OuterRef('pk')
+                    )
+                )
+            )
+        return queryset
 
     @action(
         detail=False,
@@ -24,13 +42,27 @@ class UsersViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = self.request.user
-        subscriptions = Subscription.objects.filter(user=user)
+        # Порядок как у курсорной пагинации: новые подписки первыми.
+        subscriptions = Subscription.objects.filter(
+            user=user
+        ).select_related('author').order_by('-id')
         page = self.paginate_queryset(subscriptions)
-        serializer = SubscriptionsSerializer(
-            page,
+        authors = [subscription.author for subscription in page]
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        recipes = {}
+        for recipe in Recipe.objects.recent_by_authors(
+            [author.id for author in authors],
+            int(recipes_limit) if recipes_limit.isdigit() else None
+        ):
+            recipes.setdefault(recipe.author_id, []).append(recipe)
+        for author in authors:
+            author.is_subscribed = True
+        serializer = RecipeAuthorSerializer(
+            authors,
             many=True,
             context={
-                'request': request
+                'request': request,
+                'recipes': recipes
             }
         )
         return self.get_paginated_response(serializer.data)
@@ -45,36 +77,38 @@ class UsersViewSet(UserViewSet):
     )
     def subscribe(self, request, id=None):
         user = self.request.user
-        author = get_object_or_404(
-            CustomUser,
-            id=id
-        )
         if request.method == 'GET':
-            serializer = SubscriptionsSerializer(
-                data={
-                    'user': user.id,
-                    'author': author.id
-                },
+            author = get_object_or_404(
+                CustomUser,
+                id=id
+            )
+            if user == author:
+                return Response(
+                    {
+                        'non_field_errors': [
+                            USERS_ERROR_MESSAGES['subscribe_to_yourself']
+                        ]
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            Subscription.objects.add(user=user, author=author)
+            author.is_subscribed = True
+            serializer = RecipeAuthorSerializer(
+                author,
                 context={
                     'request': request
                 }
             )
-            if serializer.is_valid():
-                serializer.save()
-                return Response(
-                    serializer.data,
-                    status=status.HTTP_201_CREATED
-                )
             return Response(
-                serializer.errors,
-                status=status.HTTP_400_BAD_REQUEST
+                serializer.data,
+                status=status.HTTP_201_CREATED
             )
-        subscription = get_object_or_404(
-            Subscription,
+        deleted, _ = Subscription.objects.filter(
             user=user,
-            author=author
-        )
-        subscription.delete()
+            author_id=id
+        ).delete()
+        if not deleted:
+            raise Http404
         return Response(
             status=status.HTTP_204_NO_CONTENT
         )